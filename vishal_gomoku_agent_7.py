@@ -1,20 +1,35 @@
 import json
-import random
 import re
-from typing import List, Tuple
+from typing import Any, Dict, List, Tuple
 from gomoku import Agent, GameState
-from gomoku.llm import OpenAIGomokuClient
+from vishal_gomoku_bitboard import BitBoard, inverse_move, transform_move
+from vishal_gomoku_threats import find_threats
+from vishal_gomoku_tt import MOVE_SALT, TranspositionTable
+from vishal_gomoku_pipeline import MovePipelineMixin
 
-class VishalGomokuLLMAgent7(Agent):
+class VishalGomokuLLMAgent7(MovePipelineMixin, Agent):
     """LLM-powered Gomoku agent with stronger diagonal threat capture and blunder-avoidance."""
 
+    # Shared by every instance in the process so positions repeat across games.
+    tt = TranspositionTable()
+
+    # Board and legal moves in the user prompt keep the LLM on rails
+    user_prompt_template = (
+        "Current player: {me}\n"
+        "Board (standard):\n{board}\n\n"
+        "legal_moves (choose exactly one of these): {legal_moves}\n\n"
+        "Output only valid JSON: {{\"row\": <int>, \"col\": <int>}} from legal_moves."
+    )
+    llm_params = {"max_tokens": 150}
+    llm_temperature = 0.0
+
     def __init__(self, agent_id: str):
         super().__init__(agent_id)
         print(f"Created VishalGomokuLLMAgent7: {agent_id}")
 
     def _setup(self):
         self.system_prompt = self._create_system_prompt()
-        self.llm = OpenAIGomokuClient(model="google/gemma-2-9b-it")
+        self._setup_pipeline(self.tt)
 
     def _create_system_prompt(self) -> str:
         return (
@@ -35,68 +50,12 @@ class VishalGomokuLLMAgent7(Agent):
         )
 
     # ===== Agent5-style lightweight tactical analysis helpers =====
-    def _parse_board_from_string(self, board_str: str) -> List[List[str]]:
-        rows: List[List[str]] = []
-        for line in board_str.strip().split('\n'):
-            tokens = [ch for ch in line if ch in ['X', 'O', '.']]
-            if len(tokens) == 8:
-                rows.append(tokens)
-        while len(rows) < 8:
-            rows.append(['.'] * 8)
-        return rows[:8]
-
-    def _check_line_for_threat(self, board: List[List[str]], start_r: int, start_c: int,
-                               dr: int, dc: int, player: str, target_count: int) -> List[Tuple[int, int]]:
-        threat_positions: List[Tuple[int, int]] = []
-        line: List[Tuple[int, int]] = []
-        r, c = start_r, start_c
-        while 0 <= r - dr < 8 and 0 <= c - dc < 8:
-            r -= dr
-            c -= dc
-        while 0 <= r < 8 and 0 <= c < 8:
-            line.append((r, c))
-            r += dr
-            c += dc
-        opp = 'O' if player == 'X' else 'X'
-        for i in range(0, max(0, len(line) - 4)):
-            window = line[i:i+5]
-            pieces = [board[rr][cc] for rr, cc in window]
-            player_count = pieces.count(player)
-            empty_count = pieces.count('.')
-            opp_count = pieces.count(opp)
-            if target_count == 4 and player_count == 4 and empty_count == 1 and opp_count == 0:
-                empty_idx = pieces.index('.')
-                threat_positions.append(window[empty_idx])
-                continue
-            if target_count == 3 and player_count == 3 and empty_count == 2 and opp_count == 0:
-                if pieces[0] == '.' and pieces[4] == '.' and pieces[1] == player and pieces[2] == player and pieces[3] == player:
-                    threat_positions.append(window[0]); threat_positions.append(window[4])
-                else:
-                    for idx, val in enumerate(pieces):
-                        if val == '.':
-                            threat_positions.append(window[idx])
-                continue
-            if target_count == 3 and player_count == 3 and empty_count == 1 and opp_count == 1:
-                empty_idx = pieces.index('.')
-                threat_positions.append(window[empty_idx])
-        if target_count == 3 and len(line) >= 4:
-            for i in range(0, len(line) - 3):
-                window4 = line[i:i+4]
-                pieces4 = [board[rr][cc] for rr, cc in window4]
-                if pieces4.count(player) == 3 and pieces4.count('.') == 1 and pieces4.count(opp) == 0:
-                    if pieces4[0] == '.' and pieces4[1] == player and pieces4[2] == player and pieces4[3] == player:
-                        threat_positions.append(window4[0])
-                    elif pieces4[3] == '.' and pieces4[0] == player and pieces4[1] == player and pieces4[2] == player:
-                        threat_positions.append(window4[3])
-        return threat_positions
-
-    def _find_all_threats(self, board: List[List[str]], player: str, target_count: int) -> List[Tuple[int, int]]:
-        threats = set()
-        for r in range(8):
-            for c in range(8):
-                for dr, dc in [(0,1), (1,0), (1,1), (1,-1)]:
-                    threats.update(self._check_line_for_threat(board, r, c, dr, dc, player, target_count))
-        return list(threats)
+    def _parse_board_from_string(self, board_str: str) -> BitBoard:
+        return BitBoard.from_string(board_str)
+
+    def _find_all_threats(self, board: BitBoard, player: str, target_count: int) -> List[Tuple[int, int]]:
+        with self.trace.phase("find_threats"):
+            return find_threats(board, player, target_count)
 
     def _pick_best_center(self, candidates: List[Tuple[int, int]], legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
         legal = [m for m in candidates if m in legal_moves]
@@ -104,74 +63,87 @@ class VishalGomokuLLMAgent7(Agent):
             return None
         return min(legal, key=lambda pos: abs(pos[0] - 3.5) + abs(pos[1] - 3.5))
 
-    def _get_strategic_move(self, board: List[List[str]], me: str, opp: str, legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+    def _get_strategic_move(self, board: BitBoard, me: str, opp: str, legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+        key, t = board.canonical_key(me)
+        key ^= MOVE_SALT
+        entry = self.tt.probe(key)
+        if entry is not None:
+            # Stored in the canonical frame; map back onto this board.
+            self.trace.note(tier="cache")
+            return inverse_move(*entry[5], t) if entry[5] else None
+        move = self._strategic_cascade(board, me, opp, legal_moves)
+        self.tt.store(key, 0, None, transform_move(*move, t) if move else None)
+        return move
+
+    def _strategic_cascade(self, board: BitBoard, me: str, opp: str, legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
         win_moves = self._find_all_threats(board, me, 4)
         best = self._pick_best_center(win_moves, legal_moves)
         if best:
+            self.trace.note(tier="win")
             return best
         block_moves = self._find_all_threats(board, opp, 4)
         best = self._pick_best_center(block_moves, legal_moves)
         if best:
+            self.trace.note(tier="block-four")
             return best
         opp_threes = self._find_all_threats(board, opp, 3)
         best = self._pick_best_center(opp_threes, legal_moves)
         if best:
+            self.trace.note(tier="block-three")
             return best
         my_threes = self._find_all_threats(board, me, 3)
         best = self._pick_best_center(my_threes, legal_moves)
         if best:
+            self.trace.note(tier="make-three")
             return best
         return None
 
-    async def get_move(self, game_state: 'GameState') -> Tuple[int, int]:  # type: ignore
-        # Build user prompt with board and legal moves to keep LLM on rails
+    async def _choose_move(self, game_state: 'GameState', deadline: float) -> Tuple[int, int]:  # type: ignore
         try:
             board_str = game_state.format_board(formatter="standard")
         except Exception:
             board_str = ""
+        self.trace.lap("format_board")
 
         try:
             legal_moves: List[Tuple[int, int]] = list(game_state.get_legal_moves())  # type: ignore
         except Exception:
             legal_moves = []
+        self.trace.lap("get_legal_moves")
 
         # Quick fallback if no LLM or no legal moves
         if not legal_moves:
+            self.trace.note(source="fallback")
             return self._fallback_centerish(game_state)
 
         current_player = getattr(getattr(game_state, "current_player", object()), "value", "?")
         opp = 'O' if current_player == 'X' else 'X'
 
         # Algorithmic safeguards first
+        self.tt.new_search()
         board = self._parse_board_from_string(board_str)
-        strat = self._get_strategic_move(board, current_player, opp, legal_moves)
-        if strat:
-            return strat
-
-        user_prompt = (
-            f"Current player: {current_player}\n"
-            f"Board (standard):\n{board_str}\n\n"
-            f"legal_moves (choose exactly one of these): {legal_moves}\n\n"
-            "Output only valid JSON: {\"row\": <int>, \"col\": <int>} from legal_moves."
-        )
-
-        # If LLM unavailable, go to deterministic fallback
-        if getattr(self, 'llm', None) is None:
-            return self._center_backbone_fallback(game_state, legal_moves)
+        self.trace.lap("parse_board")
 
+        # Ponder, forced, race, gate, search, strategic cascade, then the LLM
         try:
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
-            response = await self.llm.complete(messages=messages, temperature=0.0, max_tokens=150)
-            move = self._parse_move(response)
-            if move in legal_moves:
+            move = await self._pipeline_move(board, board_str, current_player, opp, legal_moves, deadline)
+            if move is not None:
                 return move
-        except Exception:
-            pass
-
-        return self._center_backbone_fallback(game_state, legal_moves)
+        except Exception as e:
+            self.trace.note(error=type(e).__name__)
+
+        self.trace.note(source="fallback")
+        move = self._center_backbone_fallback(game_state, legal_moves)
+        self.trace.lap("fallback")
+        return move
+
+    async def _complete_llm(self, messages: List[Dict[str, str]], params: Dict[str, Any],
+                            legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+        response = await self.llm.complete(messages=messages, **params)
+        self.trace.lap("llm")
+        move = self._parse_move(response)
+        self.trace.lap("json_parse")
+        return move if move in legal_moves else None
 
     def _parse_move(self, text: str) -> Tuple[int, int]:
         try:
@@ -0,0 +1,254 @@
+"""Per-move latency benchmark for every agent variant.
+
+Times get_move() with the LLM stubbed out, plus the hot helpers, over a
+fixed corpus of positions, and writes p50/p95/p99 and ops/sec as JSON:
+
+    python vishal_gomoku_bench.py --out bench.json
+    python vishal_gomoku_bench.py --baseline bench.json --threshold 0.2   # exit 1 on a >20% p50 regression
+
+The corpus is generated from a fixed seed, so runs on any machine time the
+same positions.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from vishal_gomoku_bitboard import BitBoard
+from vishal_gomoku_llm_server import extract_board
+from vishal_gomoku_threats import score_moves
+
+AGENTS = [
+    ("base", "vishal_gomuku_agent", "VishalGomokuLLMAgent"),
+    ("new", "vishal_gomuku_agent_new", "VishalGomokuLLMAgent3"),
+    ("agent5", "vishal_gomuku_agent_5", "VishalGomokuLLMAgent5"),
+    ("agent6", "vishal_gomoku_agent_6", "VishalGomokuLLMAgent6"),
+    ("agent7", "vishal_gomoku_agent_7", "VishalGomokuLLMAgent7"),
+]
+
+# Hand-built tactical positions; the side to move follows from the stone counts.
+_TACTICAL = [
+    # X to win on row 3
+    ["........", "........", "O.O.....", ".XXXX...", "..O.O...", "........", "........", "........"],
+    # O to move must block X's broken diagonal four at (2,2)
+    ["X.......", ".X......", ".....O..", "...X....", "....X...", "..O..O..", ".....O..", ".......X"],
+    # open threes for both sides
+    ["........", "..XXX...", "........", "..OOO...", "........", "........", "........", "........"],
+    # X double-three fork available at (3,3)
+    ["........", "...X....", "...X....", ".XX.....", "........", "........", "O..O..O.", "...O...."],
+]
+
+
+class _Player:
+    def __init__(self, value: str):
+        self.value = value
+
+
+class BenchState:
+    """The slice of gomoku.GameState the agents touch: current_player, get_legal_moves(), format_board()."""
+
+    def __init__(self, board: BitBoard, player: str):
+        self.board = board
+        self.current_player = _Player(player)
+
+    def get_legal_moves(self) -> List[Tuple[int, int]]:
+        return self.board.legal_moves()
+
+    def format_board(self, formatter: str = "standard") -> str:
+        return self.board.to_standard()
+
+
+class StubLLM:
+    """Answers instantly with the first empty cell of the prompt's board, as JSON."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        self.calls += 1
+        board = extract_board("\n".join(m["content"] for m in messages))
+        cells = board.legal_moves() if board is not None else [(3, 3)]
+        r, c = cells[0] if cells else (0, 0)
+        return json.dumps({"row": r, "col": c, "reasoning": "stub"})
+
+
+def _random_position(rng: random.Random, stones: int) -> Tuple[BitBoard, str]:
+    """Alternating random stones with no five on the board."""
+    while True:
+        board = BitBoard()
+        for k, cell in enumerate(rng.sample(range(64), stones)):
+            board.place(cell // 8, cell % 8, 'XO'[k % 2])
+        if not board.has_five('X') and not board.has_five('O'):
+            return board, 'XO'[stones % 2]
+
+
+def build_corpus(seed: int = 2024) -> List[Tuple[str, BitBoard, str]]:
+    """(category, board, side to move) for openings, mid-game, tactical and near-full positions."""
+    rng = random.Random(seed)
+    corpus: List[Tuple[str, BitBoard, str]] = []
+    for stones in (0, 1, 2, 3, 4, 5, 6, 8):
+        corpus.append(("opening", *_random_position(rng, stones)))
+    for stones in (10, 12, 14, 16, 18, 20, 22, 24):
+        corpus.append(("midgame", *_random_position(rng, stones)))
+    for rows in _TACTICAL:
+        board = BitBoard.from_rows([list(row) for row in rows])
+        player = 'X' if board.x.bit_count() <= board.o.bit_count() else 'O'
+        corpus.append(("tactical", board, player))
+    for stones in (44, 48, 52, 56, 60):
+        corpus.append(("near-full", *_random_position(rng, stones)))
+    return corpus
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    # Nearest-rank percentile.
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    total = sum(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": _percentile(samples, 50) * 1000,
+        "p95_ms": _percentile(samples, 95) * 1000,
+        "p99_ms": _percentile(samples, 99) * 1000,
+        "mean_ms": total / len(samples) * 1000,
+        "ops_per_sec": len(samples) / total if total > 0 else 0.0,
+    }
+
+
+def _time_calls(fn: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _make_agent(module: str, cls: str, search_time: float):
+    agent = getattr(importlib.import_module(module), cls)("bench")
+    agent.llm = StubLLM()
+    agent.search_time = search_time
+    if hasattr(agent, "llm_cache"):
+        agent.llm_cache.path = ""  # every move pays for its own LLM path
+        agent.ponderer.prefetch = None  # and nothing to keep a prefetched answer in
+    return agent
+
+
+def _helpers(agent, board: BitBoard, board_str: str, player: str, legal) -> List[Tuple[str, Callable[[], Any]]]:
+    """The agent's hot helpers that exist in this variant, as zero-argument calls."""
+    opp = 'O' if player == 'X' else 'X'
+    calls = []
+    if hasattr(agent, "_parse_board_from_string"):
+        calls.append(("_parse_board_from_string", lambda: agent._parse_board_from_string(board_str)))
+    if hasattr(agent, "_find_all_threats"):
+        calls.append(("_find_all_threats", lambda: (agent._find_all_threats(board, opp, 4),
+                                                    agent._find_all_threats(board, opp, 3),
+                                                    agent._find_all_threats(board, player, 3))))
+    if hasattr(agent, "_strategic_cascade"):
+        calls.append(("_strategic_cascade", lambda: agent._strategic_cascade(board, player, opp, legal)))
+    return calls
+
+
+def run(search_time: float, repeat: int, only: List[str] | None = None) -> Dict[str, Any]:
+    corpus = build_corpus()
+    loop = asyncio.new_event_loop()
+    samples: Dict[str, List[float]] = {}
+    for name, module, cls in AGENTS:
+        if only and name not in only:
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent = _make_agent(module, cls, search_time)
+            tt = getattr(agent, "tt", None)
+            for category, board, player in corpus:
+                legal = board.legal_moves()
+                if not legal:
+                    continue
+                state = BenchState(board, player)
+                for _ in range(repeat):
+                    if tt is not None:
+                        tt.clear()  # cold cache: time the work, not the previous repeat's hit
+                    start = time.perf_counter()
+                    loop.run_until_complete(agent.get_move(state))
+                    elapsed = time.perf_counter() - start
+                    loop.run_until_complete(agent.end_game())  # every corpus position is its own game
+                    samples.setdefault(f"{name}.get_move", []).append(elapsed)
+                    samples.setdefault(f"{name}.get_move[{category}]", []).append(elapsed)
+                for key, fn in _helpers(agent, board, state.format_board(), player, legal):
+                    samples.setdefault(f"{name}.{key}", []).extend(_time_calls(fn, repeat))
+    loop.close()
+    # Shared helpers every variant calls.
+    for category, board, player in corpus:
+        board_str = BenchState(board, player).format_board()
+        samples.setdefault("shared.BitBoard.from_string", []).extend(
+            _time_calls(lambda: BitBoard.from_string(board_str), repeat))
+        samples.setdefault("shared.score_moves", []).extend(_time_calls(lambda: score_moves(board, player), repeat))
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "corpus": len(corpus),
+            "repeat": repeat,
+            "search_time": search_time,
+        },
+        "results": {key: summarize(values) for key, values in samples.items()},
+    }
+
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Benchmarks whose p50 grew by more than threshold (0.2 = 20%) over the baseline run."""
+    found = []
+    for key, base in baseline.get("results", {}).items():
+        now = current["results"].get(key)
+        if now is None or base["p50_ms"] <= 0:
+            continue
+        growth = now["p50_ms"] / base["p50_ms"] - 1
+        if growth > threshold:
+            found.append(f"{key}: p50 {base['p50_ms']:.3f} -> {now['p50_ms']:.3f} ms (+{growth:.0%})")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-move latency benchmark for the Gomoku agents")
+    parser.add_argument("--search-time", type=float, default=0.05,
+                        help="per-move search budget given to every agent (0 benchmarks the cascade/LLM path)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed calls per position")
+    parser.add_argument("--agents", nargs="*", help=f"subset of {[a[0] for a in AGENTS]}")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 growth before failing")
+    args = parser.parse_args()
+
+    report = run(args.search_time, args.repeat, args.agents)
+    print(f"{'benchmark':48} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10}")
+    for key, r in report["results"].items():
+        print(f"{key:48} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['ops_per_sec']:10.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(report, baseline, args.threshold)
+        if found:
+            print("REGRESSIONS:")
+            for line in found:
+                print("  " + line)
+            sys.exit(1)
+        print(f"No p50 regression over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import random
+from typing import List, Tuple
+
+# The 8x8 board fits in one 64-bit int per side: bit (r * 8 + c) is set
+# when the cell at (r, c) holds a stone of that side.
+BOARD_SIZE = 8
+FULL_MASK = (1 << 64) - 1
+COL_0 = 0x0101010101010101
+COL_7 = COL_0 << 7
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+CELL_BITS = [1 << i for i in range(64)]
+
+# Zobrist keys, seeded so every process (and every run) hashes a position the same way.
+_zobrist_rng = random.Random(0x60A0C0)
+ZOBRIST = {p: [_zobrist_rng.getrandbits(64) for _ in range(64)] for p in ('X', 'O')}
+ZOBRIST_SIDE = {p: _zobrist_rng.getrandbits(64) for p in ('X', 'O')}
+
+
+def cell_bit(r: int, c: int) -> int:
+    """Return the single-bit mask for (r, c)."""
+    return 1 << (r * 8 + c)
+
+
+def bit_cells(mask: int) -> List[Tuple[int, int]]:
+    """List the (row, col) cells set in a mask, in row-major order."""
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(divmod(low.bit_length() - 1, 8))
+        mask ^= low
+    return cells
+
+
+def shift(mask: int, dr: int, dc: int) -> int:
+    """Move every set bit one step by (dr, dc), dropping bits that leave the board."""
+    if dc == 1:
+        mask &= ~COL_7
+    elif dc == -1:
+        mask &= ~COL_0
+    s = dr * 8 + dc
+    if s > 0:
+        return (mask << s) & FULL_MASK
+    return mask >> -s
+
+
+def _build_rays() -> List[List[Tuple[Tuple[int, ...], Tuple[int, ...]]]]:
+    rays = []
+    for i in range(64):
+        r, c = divmod(i, 8)
+        per_dir = []
+        for dr, dc in DIRECTIONS:
+            fwd = []
+            rr, cc = r + dr, c + dc
+            while 0 <= rr < 8 and 0 <= cc < 8:
+                fwd.append(cell_bit(rr, cc))
+                rr += dr
+                cc += dc
+            back = []
+            rr, cc = r - dr, c - dc
+            while 0 <= rr < 8 and 0 <= cc < 8:
+                back.append(cell_bit(rr, cc))
+                rr -= dr
+                cc -= dc
+            per_dir.append((tuple(fwd), tuple(back)))
+        rays.append(per_dir)
+    return rays
+
+
+# RAYS[cell][d] = (bits walking forward along DIRECTIONS[d], bits walking back)
+RAYS = _build_rays()
+
+
+def zobrist_key(x: int, o: int) -> int:
+    """Zobrist hash of a position given its two stone masks."""
+    key = 0
+    for player, stones in (('X', x), ('O', o)):
+        table = ZOBRIST[player]
+        while stones:
+            low = stones & -stones
+            key ^= table[low.bit_length() - 1]
+            stones ^= low
+    return key
+
+
+def has_five(stones: int) -> bool:
+    """True if the stones contain five (or more) in a row in any direction."""
+    for dr, dc in DIRECTIONS:
+        run = stones
+        for _ in range(4):
+            run &= shift(run, -dr, -dc)
+        if run:
+            return True
+    return False
+
+
+def winning_mask(stones: int, empty: int) -> int:
+    """Mask of empty cells where one more stone completes five in a row.
+
+    Covers every gap position (XXXX., XXX.X, XX.XX, ...) in all four
+    directions using only shifts and ANDs.
+    """
+    wins = 0
+    for dr, dc in DIRECTIONS:
+        # along[4 + j] has bit i set when cell i + j * (dr, dc) holds a stone
+        along = [0] * 9
+        p = stones
+        for j in range(1, 5):
+            p = shift(p, -dr, -dc)
+            along[4 + j] = p
+        p = stones
+        for j in range(1, 5):
+            p = shift(p, dr, dc)
+            along[4 - j] = p
+        for gap in range(5):
+            m = empty
+            for j in range(-gap, 5 - gap):
+                if j:
+                    m &= along[4 + j]
+            wins |= m
+    return wins
+
+
+# The 8 symmetries of the board: transform t transposes when t & 4, then
+# flips rows when t & 2, then mirrors columns when t & 1.
+SYMMETRIES = range(8)
+_K1, _K2, _K4 = 0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F
+
+
+def flip_rows(mask: int) -> int:
+    """Row r -> row 7 - r (each row is one byte)."""
+    return int.from_bytes(mask.to_bytes(8, 'little'), 'big')
+
+
+def mirror_cols(mask: int) -> int:
+    """Column c -> column 7 - c (bit reversal inside each byte)."""
+    mask = ((mask >> 1) & _K1) | ((mask & _K1) << 1)
+    mask = ((mask >> 2) & _K2) | ((mask & _K2) << 2)
+    return ((mask >> 4) & _K4) | ((mask & _K4) << 4)
+
+
+def transpose(mask: int) -> int:
+    """(r, c) -> (c, r) with three delta swaps."""
+    t = 0x0F0F0F0F00000000 & (mask ^ (mask << 28))
+    mask ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (mask ^ (mask << 14))
+    mask ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (mask ^ (mask << 7))
+    mask ^= t ^ (t >> 7)
+    return mask & FULL_MASK
+
+
+def transform_mask(mask: int, t: int) -> int:
+    if t & 4:
+        mask = transpose(mask)
+    if t & 2:
+        mask = flip_rows(mask)
+    if t & 1:
+        mask = mirror_cols(mask)
+    return mask
+
+
+def transform_move(r: int, c: int, t: int) -> Tuple[int, int]:
+    """Where (r, c) lands under transform t."""
+    if t & 4:
+        r, c = c, r
+    if t & 2:
+        r = 7 - r
+    if t & 1:
+        c = 7 - c
+    return r, c
+
+
+def inverse_move(r: int, c: int, t: int) -> Tuple[int, int]:
+    """Map a move in the transformed frame back to the original board."""
+    if t & 1:
+        c = 7 - c
+    if t & 2:
+        r = 7 - r
+    if t & 4:
+        r, c = c, r
+    return r, c
+
+
+def canonical(x: int, o: int) -> Tuple[int, int, int]:
+    """(x, o, t): the smallest of the 8 symmetric images of a position and the transform giving it."""
+    best = (x, o, 0)
+    tx, to = transpose(x), transpose(o)
+    for t, (bx, bo) in ((0, (x, o)), (4, (tx, to))):
+        fx, fo = flip_rows(bx), flip_rows(bo)
+        for t2, (cx, co) in ((t, (bx, bo)), (t | 2, (fx, fo))):
+            for t3, (mx, mo) in ((t2, (cx, co)), (t2 | 1, (mirror_cols(cx), mirror_cols(co)))):
+                if (mx, mo) < best[:2]:
+                    best = (mx, mo, t3)
+    return best
+
+
+class BitBoard:
+    """Two-int bitboard position with place/undo and five-in-a-row tests.
+
+    `key` is the Zobrist hash of the stones, updated on every place/undo.
+    """
+
+    __slots__ = ("x", "o", "key", "_history")
+
+    def __init__(self, x: int = 0, o: int = 0):
+        self.x = x
+        self.o = o
+        self.key = zobrist_key(x, o)
+        self._history: List[Tuple[int, str]] = []
+
+    @classmethod
+    def from_string(cls, board_str: str) -> "BitBoard":
+        """Parse a formatted board - robust across formats (labels are ignored)."""
+        board = cls()
+        r = 0
+        for line in board_str.strip().split('\n'):
+            tokens = [ch for ch in line if ch in ['X', 'O', '.']]
+            if len(tokens) != 8:
+                continue
+            for c, ch in enumerate(tokens):
+                if ch == 'X':
+                    board.x |= cell_bit(r, c)
+                elif ch == 'O':
+                    board.o |= cell_bit(r, c)
+            r += 1
+            if r == 8:
+                break
+        board.key = zobrist_key(board.x, board.o)
+        return board
+
+    @classmethod
+    def from_rows(cls, rows: List[List[str]]) -> "BitBoard":
+        board = cls()
+        for r, row in enumerate(rows[:8]):
+            for c, ch in enumerate(row[:8]):
+                if ch == 'X':
+                    board.x |= cell_bit(r, c)
+                elif ch == 'O':
+                    board.o |= cell_bit(r, c)
+        board.key = zobrist_key(board.x, board.o)
+        return board
+
+    def copy(self) -> "BitBoard":
+        return BitBoard(self.x, self.o)
+
+    def side_key(self, player: str) -> int:
+        """Zobrist key of this position with player to move."""
+        return self.key ^ ZOBRIST_SIDE[player]
+
+    def canonical_key(self, player: str) -> Tuple[int, int]:
+        """(key, t): Zobrist key of the canonical image with player to move, and its transform.
+
+        Mirrored and rotated copies of a position share the key; store moves
+        through transform_move(..., t) and read them back with inverse_move(..., t).
+        """
+        x, o, t = canonical(self.x, self.o)
+        return zobrist_key(x, o) ^ ZOBRIST_SIDE[player], t
+
+    def key_after(self, r: int, c: int, player: str) -> int:
+        """Zobrist key of this position after player's stone on (r, c), without placing it."""
+        return self.key ^ ZOBRIST[player][r * 8 + c]
+
+    def stones(self, player: str) -> int:
+        return self.x if player == 'X' else self.o
+
+    def occupied(self) -> int:
+        return self.x | self.o
+
+    def empty_mask(self) -> int:
+        """Legal-move mask: every empty cell."""
+        return ~(self.x | self.o) & FULL_MASK
+
+    def legal_moves(self) -> List[Tuple[int, int]]:
+        return bit_cells(self.empty_mask())
+
+    def stone_count(self) -> int:
+        return (self.x | self.o).bit_count()
+
+    def is_empty(self, r: int, c: int) -> bool:
+        return not (self.x | self.o) & cell_bit(r, c)
+
+    def cell(self, r: int, c: int) -> str:
+        b = cell_bit(r, c)
+        if self.x & b:
+            return 'X'
+        if self.o & b:
+            return 'O'
+        return '.'
+
+    def place(self, r: int, c: int, player: str) -> None:
+        b = cell_bit(r, c)
+        if (self.x | self.o) & b:
+            raise ValueError(f"Cell ({r},{c}) is already occupied")
+        if player == 'X':
+            self.x |= b
+        else:
+            self.o |= b
+        self.key ^= ZOBRIST[player][r * 8 + c]
+        self._history.append((r * 8 + c, player))
+
+    def last_move(self) -> Tuple[int, int, str] | None:
+        """(row, col, player) of the most recent place(), or None."""
+        if not self._history:
+            return None
+        idx, player = self._history[-1]
+        r, c = divmod(idx, 8)
+        return r, c, player
+
+    def undo(self) -> Tuple[int, int]:
+        idx, player = self._history.pop()
+        if player == 'X':
+            self.x &= ~CELL_BITS[idx]
+        else:
+            self.o &= ~CELL_BITS[idx]
+        self.key ^= ZOBRIST[player][idx]
+        return divmod(idx, 8)
+
+    def run_lengths(self, r: int, c: int, player: str) -> List[int]:
+        """Contiguous run through (r, c) in each direction, counting (r, c) as player's."""
+        stones = self.x if player == 'X' else self.o
+        lengths = []
+        for fwd, back in RAYS[r * 8 + c]:
+            n = 1
+            for b in fwd:
+                if not stones & b:
+                    break
+                n += 1
+            for b in back:
+                if not stones & b:
+                    break
+                n += 1
+            lengths.append(n)
+        return lengths
+
+    def five_if_place(self, r: int, c: int, player: str) -> bool:
+        """True if placing player's stone on the empty cell (r, c) makes five in a row."""
+        if not self.is_empty(r, c):
+            return False
+        return max(self.run_lengths(r, c, player)) >= 5
+
+    def winning_cells(self, player: str) -> int:
+        """Mask of cells where player completes five with one stone."""
+        return winning_mask(self.stones(player), self.empty_mask())
+
+    def has_five(self, player: str) -> bool:
+        return has_five(self.stones(player))
+
+    def to_rows(self) -> List[List[str]]:
+        return [[self.cell(r, c) for c in range(8)] for r in range(8)]
+
+    def to_standard(self) -> str:
+        """The board as gomoku's format_board("standard") prints it: column header, then labelled rows."""
+        lines = ["  " + " ".join(str(c) for c in range(8))]
+        lines += [f"{r} " + " ".join(row) for r, row in enumerate(self.to_rows())]
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return '\n'.join(''.join(row) for row in self.to_rows())
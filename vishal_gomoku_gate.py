@@ -0,0 +1,88 @@
+import os
+from typing import Any, Dict, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard
+from vishal_gomoku_mcts import MCTSEngine
+from vishal_gomoku_search import WIN
+
+# Consult the LLM only in unclear positions (1), or whenever the agent's own order reaches it (0).
+DEFAULT_LLM_GATE = os.environ.get("VISHAL_GOMOKU_LLM_GATE", "0") == "1"
+# Evaluator margin (best root score minus second best) above which the position counts as
+# clear, for the opening, middle game and late game.
+DEFAULT_GATE_MARGINS = tuple(int(m) for m in os.environ.get("VISHAL_GOMOKU_LLM_GATE_MARGINS", "10,40,80").split(","))
+# The same margins for the MCTS engine, whose root scores are per-mille win rates; set so the
+# call rate per phase is close to alpha-beta's under the default margins and search time.
+DEFAULT_GATE_WIN_RATE_MARGINS = tuple(
+    int(m) for m in os.environ.get("VISHAL_GOMOKU_LLM_GATE_WIN_RATE_MARGINS", "50,70,110").split(","))
+# Search budget for the gate's evaluation when the agent has no search budget of its own, in seconds.
+DEFAULT_GATE_TIME = float(os.environ.get("VISHAL_GOMOKU_LLM_GATE_TIME", "0.1"))
+# Stone counts that end the opening and the middle game (the base agent's EARLY/MID/LATE split).
+PHASE_LIMITS = (10, 30)
+PHASES = ("opening", "middle", "late")
+
+
+class GateDecision(NamedTuple):
+    consult: bool
+    reason: str  # "forced", "single", "clear" or "unclear"
+    move: Tuple[int, int] | None  # the evaluator's best move
+    margin: int
+    phase: str
+
+
+def phase_of(board: BitBoard) -> str:
+    stones = board.stone_count()
+    return PHASES[sum(stones > limit for limit in PHASE_LIMITS)]
+
+
+class LLMGate:
+    """Decides from a short engine search whether a position is unclear enough to ask the LLM.
+
+    The LLM is skipped when the search proves a result (a forced line
+    either way), when there is a single sensible move, or when the best
+    root move beats the second by more than the margin for the game phase
+    (win_rate_margins when the engine is MCTS). Counters per phase give the
+    call rate.
+    """
+
+    def __init__(self, enabled: bool = DEFAULT_LLM_GATE, margins: Tuple[int, ...] = DEFAULT_GATE_MARGINS,
+                 think_time: float = DEFAULT_GATE_TIME,
+                 win_rate_margins: Tuple[int, ...] = DEFAULT_GATE_WIN_RATE_MARGINS):
+        for m in (margins, win_rate_margins):
+            if len(m) != len(PHASES):
+                raise ValueError(f"need one gate margin per phase {PHASES}, got {m}")
+        self.enabled = enabled
+        self.margins = dict(zip(PHASES, margins))
+        self.win_rate_margins = dict(zip(PHASES, win_rate_margins))
+        self.think_time = think_time
+        self.counts: Dict[str, Dict[str, int]] = {p: {"positions": 0, "consulted": 0} for p in PHASES}
+        self.reasons: Dict[str, int] = {"forced": 0, "single": 0, "clear": 0, "unclear": 0}
+
+    def decide(self, engine: Any, board: BitBoard, player: str, think_time: float = 0.0) -> GateDecision:
+        """Search board for think_time (the gate's own budget when 0) and judge how clear the best move is."""
+        result = engine.search(board, player, think_time or self.think_time)
+        phase = phase_of(board)
+        scores = sorted(result.root_scores.values(), reverse=True)
+        margin = scores[0] - scores[1] if len(scores) > 1 else 0
+        if abs(result.score) >= WIN - 64:
+            reason = "forced"
+        elif len(scores) <= 1:
+            reason = "single"
+        elif margin > (self.win_rate_margins if isinstance(engine, MCTSEngine) else self.margins)[phase]:
+            reason = "clear"
+        else:
+            reason = "unclear"
+        consult = reason == "unclear"
+        self.counts[phase]["positions"] += 1
+        self.counts[phase]["consulted"] += consult
+        self.reasons[reason] += 1
+        return GateDecision(consult, reason, result.move, margin, phase)
+
+    def stats(self) -> Dict[str, Any]:
+        """Call rate overall and per phase, and how often each reason decided."""
+        positions = sum(c["positions"] for c in self.counts.values())
+        consulted = sum(c["consulted"] for c in self.counts.values())
+        out: Dict[str, Any] = {"positions": positions, "consulted": consulted,
+                               "call_rate": consulted / positions if positions else 0.0}
+        for phase, c in self.counts.items():
+            out[f"call_rate_{phase}"] = c["consulted"] / c["positions"] if c["positions"] else 0.0
+        out.update(self.reasons)
+        return out
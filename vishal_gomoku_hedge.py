@@ -0,0 +1,329 @@
+"""Hedged and parallel LLM requests in place of sequential retries.
+
+LLMHedger gets one legal move out of the LLM in one of three ways:
+
+- sequential: up to max_requests calls one after another (the old retry loop);
+- hedged: if the first call has not answered by the `percentile` of recent
+  call latencies, a second one is fired alongside it, and so on up to
+  max_requests; the first valid, legal move wins and the rest are cancelled;
+- samples: `samples` calls up front at `vote_temperature`, majority vote,
+  ties and unsafe moves settled by the threat scanner.
+
+A request that comes back with a malformed or illegal answer is retried
+with that answer and a correction appended to the conversation, as the
+old retry loop did; a request that failed outright is sent again as is.
+
+    python vishal_gomoku_hedge.py --moves 100 --latency 0.8 --latency-dist lognormal --malformed-rate 0.05
+
+plays each policy against the in-process stand-in LLM and prints requests
+per move and move-latency percentiles, so cost can be weighed against tail
+latency. With --check it first verifies that hedged-away slow calls still
+count in the latency percentile the hedge delay is taken from.
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard, cell_bit
+from vishal_gomoku_prompt import parse_move
+from vishal_gomoku_threats import score_moves
+
+# Latency percentile (e.g. 90) after which a hedge request is fired; 0 disables hedging.
+DEFAULT_HEDGE_PERCENTILE = float(os.environ.get("VISHAL_GOMOKU_LLM_HEDGE", "0"))
+# Hedge delay in seconds until enough latencies have been seen for the percentile.
+DEFAULT_HEDGE_AFTER = float(os.environ.get("VISHAL_GOMOKU_LLM_HEDGE_AFTER", "2.0"))
+# Parallel samples per move for majority voting; 1 disables voting.
+DEFAULT_LLM_SAMPLES = int(os.environ.get("VISHAL_GOMOKU_LLM_SAMPLES", "1"))
+# Sampling temperature of the voting policy's requests: greedy samples would all agree.
+DEFAULT_VOTE_TEMPERATURE = float(os.environ.get("VISHAL_GOMOKU_LLM_VOTE_TEMPERATURE", "0.7"))
+# Same ceiling as the base agent's retry loop.
+DEFAULT_MAX_REQUESTS = 3
+# Recent call latencies the percentile is taken over (a cancelled call counts its time so far
+# once it has outlasted the hedge delay).
+LATENCY_WINDOW = 200
+MIN_HISTORY = 10
+
+Complete = Callable[..., Awaitable[str]]  # an LLM client's complete(messages=..., **params)
+
+RETRY_FEEDBACK = ("That answer is not a legal move in the requested format. "
+                  "Reply again with JSON only, choosing a legal empty cell.")
+
+
+def _quantile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+class HedgeResult(NamedTuple):
+    move: Tuple[int, int] | None
+    requests: int
+    elapsed: float
+    winner: int  # index of the request whose answer was used, -1 for none
+    votes: Dict[Tuple[int, int], int]
+
+
+class LLMHedger:
+    """Issues the LLM requests for one move under a hedging or voting policy and keeps counters."""
+
+    def __init__(self, percentile: float = DEFAULT_HEDGE_PERCENTILE, samples: int = DEFAULT_LLM_SAMPLES,
+                 max_requests: int = DEFAULT_MAX_REQUESTS, initial_after: float = DEFAULT_HEDGE_AFTER,
+                 vote_temperature: float = DEFAULT_VOTE_TEMPERATURE):
+        self.percentile = percentile
+        self.samples = max(1, samples)
+        self.vote_temperature = vote_temperature
+        self.max_requests = max(1, max_requests)
+        self.initial_after = initial_after
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.move_latencies: deque = deque(maxlen=1000)
+        self.counts = {"moves": 0, "requests": 0, "hedges": 0, "hedge_wins": 0,
+                       "invalid": 0, "errors": 0, "no_move": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.percentile > 0 or self.samples > 1
+
+    def hedge_after(self) -> float:
+        if len(self.latencies) < MIN_HISTORY:
+            return self.initial_after
+        return _quantile(list(self.latencies), self.percentile)
+
+    async def move(self, complete: Complete, messages: List[Dict[str, str]], params: Dict[str, Any],
+                   legal_moves: List[Tuple[int, int]], board: BitBoard | None = None,
+                   player: str | None = None) -> HedgeResult:
+        """A legal move from `complete(messages=messages, **params)` answers under this hedger's policy.
+
+        board and player, when given, let the voting policy drop moves that
+        hand the opponent a five and break ties by the threat scanner's score.
+        """
+        start = time.perf_counter()
+        if self.samples > 1:
+            move, requests, winner, votes = await self._vote(complete, messages, params, legal_moves, board, player)
+        elif self.percentile > 0:
+            move, requests, winner, votes = await self._hedge(complete, messages, params, legal_moves)
+        else:
+            move, requests, winner, votes = await self._sequential(complete, messages, params, legal_moves)
+        elapsed = time.perf_counter() - start
+        self.counts["moves"] += 1
+        self.counts["requests"] += requests
+        self.counts["no_move"] += move is None
+        self.counts["hedge_wins"] += winner > 0 and self.samples == 1 and self.percentile > 0
+        self.move_latencies.append(elapsed)
+        return HedgeResult(move, requests, elapsed, winner, votes)
+
+    def stats(self) -> Dict[str, Any]:
+        moves = self.counts["moves"]
+        out: Dict[str, Any] = dict(self.counts)
+        out["requests_per_move"] = self.counts["requests"] / moves if moves else 0.0
+        out["hedge_after_s"] = self.hedge_after()
+        if self.move_latencies:
+            samples = list(self.move_latencies)
+            for p in (50, 95, 99):
+                out[f"p{p}_ms"] = _quantile(samples, p) * 1000
+        return out
+
+    async def _timed(self, complete: Complete, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        start = time.perf_counter()
+        try:
+            text = await complete(messages=messages, **params)
+        except asyncio.CancelledError:
+            # A cancelled call took at least this long. The slow ones it was hedged against must
+            # count, or the percentile drifts down and every hedge fires earlier; a hedge cancelled
+            # soon after it was fired says nothing about the tail.
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.hedge_after():
+                self.latencies.append(elapsed)
+            raise
+        except Exception:
+            self.latencies.append(time.perf_counter() - start)
+            raise
+        self.latencies.append(time.perf_counter() - start)
+        return text
+
+    def _retry_messages(self, messages: List[Dict[str, str]], task: "asyncio.Future[str]") -> List[Dict[str, str]]:
+        """The conversation for a retry: a bad answer goes back with a correction, a failed call is re-sent."""
+        if task.exception() is not None:
+            return messages
+        return messages + [{"role": "assistant", "content": task.result()},
+                           {"role": "user", "content": RETRY_FEEDBACK}]
+
+    def _check(self, task: "asyncio.Future[str]", legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+        if task.exception() is not None:
+            self.counts["errors"] += 1
+            return None
+        move = parse_move(task.result())
+        if move not in legal_moves:
+            self.counts["invalid"] += 1
+            return None
+        return move
+
+    async def _sequential(self, complete: Complete, messages: List[Dict[str, str]], params: Dict[str, Any],
+                          legal_moves: List[Tuple[int, int]]):
+        for attempt in range(self.max_requests):
+            task = asyncio.ensure_future(self._timed(complete, messages, params))
+            await asyncio.wait({task})
+            move = self._check(task, legal_moves)
+            if move is not None:
+                return move, attempt + 1, attempt, {move: 1}
+            messages = self._retry_messages(messages, task)
+        return None, self.max_requests, -1, {}
+
+    async def _hedge(self, complete: Complete, messages: List[Dict[str, str]], params: Dict[str, Any],
+                     legal_moves: List[Tuple[int, int]]):
+        pending: Dict[asyncio.Future, Tuple[int, List[Dict[str, str]]]] = {}
+        sent = 0
+
+        def fire(conversation: List[Dict[str, str]]) -> None:
+            nonlocal sent
+            pending[asyncio.ensure_future(self._timed(complete, conversation, params))] = sent, conversation
+            sent += 1
+
+        fire(messages)
+        next_hedge = time.perf_counter() + self.hedge_after()
+        try:
+            while pending:
+                timeout = max(0.0, next_hedge - time.perf_counter()) if sent < self.max_requests else None
+                done, _ = await asyncio.wait(set(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The outstanding requests are slower than usual: hedge with another one.
+                    self.counts["hedges"] += 1
+                    fire(messages)
+                    next_hedge = time.perf_counter() + self.hedge_after()
+                    continue
+                for task in done:
+                    index, conversation = pending.pop(task)
+                    move = self._check(task, legal_moves)
+                    if move is not None:
+                        return move, sent, index, {move: 1}
+                    if sent < self.max_requests:
+                        # A bad answer is replaced at once, not after the others
+                        fire(self._retry_messages(conversation, task))
+            return None, sent, -1, {}
+        finally:
+            for task in pending:
+                if task.done() and not task.cancelled():
+                    task.exception()  # answered alongside the winner; nothing to report
+                task.cancel()
+
+    async def _vote(self, complete: Complete, messages: List[Dict[str, str]], params: Dict[str, Any],
+                    legal_moves: List[Tuple[int, int]], board: BitBoard | None, player: str | None):
+        # Sampled, not greedy: at the caller's temperature (often 0) every sample would be the same answer.
+        params = dict(params, temperature=self.vote_temperature)
+        pending = {asyncio.ensure_future(self._timed(complete, messages, params)) for _ in range(self.samples)}
+        votes: Dict[Tuple[int, int], int] = {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    move = self._check(task, legal_moves)
+                    if move is not None:
+                        votes[move] = votes.get(move, 0) + 1
+                if votes and max(votes.values()) * 2 > self.samples:
+                    break  # a strict majority: the remaining answers cannot change the pick
+        finally:
+            for task in pending:
+                task.cancel()
+        if not votes:
+            return None, self.samples, -1, votes
+        return self._pick(votes, board, player), self.samples, 0, votes
+
+    def _pick(self, votes: Dict[Tuple[int, int], int], board: BitBoard | None, player: str | None) -> Tuple[int, int]:
+        """Most-voted move; with a board, unsafe moves are dropped and ties go to the threat scanner."""
+        if board is None or player is None:
+            return max(votes, key=lambda m: votes[m])
+        scores = score_moves(board, player)
+        safe = [m for m in votes if not scores.gives_five & cell_bit(m[0], m[1])] or list(votes)
+        return min(safe, key=lambda m: (-votes[m], scores.key(m)))
+
+
+async def _run_policy(hedger: LLMHedger, client: Any, boards: List[Tuple[BitBoard, str]], moves: int) -> None:
+    for i in range(moves):
+        board, player = boards[i % len(boards)]
+        messages = [{"role": "user", "content": f"You: {player}\nBOARD:\n{board.to_standard()}\nReply with JSON."}]
+        await hedger.move(client.complete, messages, {}, board.legal_moves(), board, player)
+
+
+async def check_cancelled_latencies(fast: float = 0.01, moves: int = 5) -> List[str]:
+    """Problems with the latency history when each move's first call hangs and its hedge wins."""
+    # No hedges while the history fills up: the first delay is far above any call.
+    hedger = LLMHedger(percentile=90, samples=1, initial_after=60.0)
+    answer = '{"row": 3, "col": 3}'
+    legal = BitBoard().legal_moves()
+
+    async def quick(**_: Any) -> str:
+        await asyncio.sleep(fast)
+        return answer
+
+    for _ in range(MIN_HISTORY):
+        await hedger.move(quick, [], {}, legal)
+    before = hedger.hedge_after()
+    for _ in range(moves):
+        calls = 0
+
+        async def first_hangs(**_: Any) -> str:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await asyncio.sleep(60)
+            return await quick()
+
+        result = await hedger.move(first_hangs, [], {}, legal)
+        if result.winner < 1:
+            return [f"expected a hedge request to win, got request {result.winner}"]
+    await asyncio.sleep(0)  # let the cancelled calls unwind
+    if not hedger.hedge_after() > before:
+        return [f"hedge delay stayed at {before * 1000:.1f} ms after {moves} hedged-away slow calls"]
+    return []
+
+
+def main() -> None:
+    from vishal_gomoku_bench import build_corpus
+    from vishal_gomoku_llm_server import StandInClient, StandInConfig
+
+    parser = argparse.ArgumentParser(description="Compare sequential, hedged and voting LLM request policies")
+    parser.add_argument("--moves", type=int, default=60)
+    parser.add_argument("--percentile", type=float, default=90, help="hedge after this latency percentile")
+    parser.add_argument("--samples", type=int, default=3, help="parallel samples for the voting policy")
+    parser.add_argument("--latency", type=float, default=0.5, help="mean stand-in latency, seconds")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exp", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.8)
+    parser.add_argument("--malformed-rate", type=float, default=0.05)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--check", action="store_true",
+                        help="check that cancelled slow calls move the hedge percentile; exit 1 if not")
+    args = parser.parse_args()
+
+    if args.check:
+        problems = asyncio.run(check_cancelled_latencies())
+        for line in problems:
+            print(line)
+        print(f"latency check: {'FAILED' if problems else 'ok'}")
+        if problems:
+            sys.exit(1)
+
+    boards = [(board, player) for _, board, player in build_corpus() if board.empty_mask()]
+    policies = [
+        ("sequential", LLMHedger(percentile=0, samples=1)),
+        (f"hedged p{args.percentile:g}", LLMHedger(percentile=args.percentile, samples=1)),
+        (f"samples x{args.samples}", LLMHedger(percentile=0, samples=args.samples)),
+    ]
+    print(f"{'policy':16} {'req/move':>9} {'no move':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'p99 saved':>10}")
+    base_p99 = None
+    for name, hedger in policies:
+        config = StandInConfig("random", args.latency, args.latency_dist, args.latency_sigma, args.malformed_rate,
+                               args.rate_429, args.timeout_rate, args.timeout_seconds, seed=args.seed)
+        asyncio.run(_run_policy(hedger, StandInClient(config), boards, args.moves))
+        s = hedger.stats()
+        base_p99 = s["p99_ms"] if base_p99 is None else base_p99
+        print(f"{name:16} {s['requests_per_move']:9.2f} {s['no_move']:8d} {s['p50_ms']:9.0f} {s['p95_ms']:9.0f} "
+              f"{s['p99_ms']:9.0f} {base_p99 - s['p99_ms']:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
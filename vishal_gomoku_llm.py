@@ -0,0 +1,439 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+from vishal_gomoku_llm_server import extract_board
+
+# LLM client mode for every agent: "passthrough" (live client, the default),
+# "record" (live client, every call appended to the cassette) or "replay"
+# (answers served from the cassette, no network at all).
+DEFAULT_LLM_MODE = os.environ.get("VISHAL_GOMOKU_LLM_MODE", "passthrough")
+DEFAULT_CASSETTE = os.environ.get("VISHAL_GOMOKU_LLM_CASSETTE", "vishal_gomoku_llm.cassette.jsonl")
+# In replay mode, sleep for each call's recorded latency (1) or answer at once (0).
+DEFAULT_REPLAY_LATENCY = os.environ.get("VISHAL_GOMOKU_LLM_REPLAY_LATENCY", "0") == "1"
+# Stream completions and stop reading once the move is decoded (1), or wait for the whole answer (0).
+DEFAULT_LLM_STREAM = os.environ.get("VISHAL_GOMOKU_LLM_STREAM", "0") == "1"
+
+# A finished integer field: the number must be followed by a delimiter, so "1" of "12" is not taken early.
+_ROW_FIELD = re.compile(r'"row"\s*:\s*"?(\d+)"?\s*[,}\s]')
+_COL_FIELD = re.compile(r'"col"\s*:\s*"?(\d+)"?\s*[,}\s]')
+_MOVE_FIELD = re.compile(r'"move"\s*:\s*"\s*([A-Ha-h])\s*([1-8])\s*"')
+# A flat JSON object in a prompt (an output schema candidate), and one "key": value entry of it:
+# the whitespace before the entry, the entry itself, its key. String values may hold commas.
+_SCHEMA = re.compile(r'\{[^{}]*\}')
+_SCHEMA_ENTRY = re.compile(r'(\s*)("(\w+)"\s*:\s*(?:"(?:[^"\\]|\\.)*"|<[^<>]*>|[^\s,{}"]+))\s*')
+# Schema keys a streamed answer should give first, in this order.
+MOVE_KEYS = ("move", "row", "col")
+
+
+class CassetteMiss(KeyError):
+    """Replay mode was asked for a request that was never recorded."""
+
+
+def request_key(model: str, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+    """Stable digest of everything that determines an LLM answer."""
+    payload = json.dumps({"model": model, "messages": messages, **kwargs}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class RecordingLLMClient:
+    """Forwards to a live client and appends each call to a JSON-lines cassette.
+
+    One line per call: request key, response text (or the error raised) and
+    wall-clock latency. Lines are flushed as they are written, so several
+    processes can record into the same file.
+    """
+
+    def __init__(self, inner: Any, model: str, path: str = DEFAULT_CASSETTE):
+        self.inner = inner
+        self.model = model
+        self.path = path
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return await self._record(request_key(self.model, messages, **kwargs),
+                                  self.inner.complete(messages=messages, **kwargs))
+
+    async def _record(self, key: str, call: Awaitable[Any], **extra: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            response = await call
+        except Exception as e:
+            self._append({"k": key, "e": f"{type(e).__name__}: {e}", "t": round(time.perf_counter() - start, 4),
+                          **extra})
+            raise
+        self._append({"k": key, "r": response, "t": round(time.perf_counter() - start, 4), **extra})
+        return response
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+class RecordingLogprobClient(RecordingLLMClient):
+    """RecordingLLMClient for a client with top_logprobs(), whose calls go to the cassette too."""
+
+    async def top_logprobs(self, messages: List[Dict[str, str]], n: int, **kwargs: Any) -> List[Tuple[str, float]]:
+        key = request_key(self.model, messages, top_logprobs=n, **kwargs)
+        return await self._record(key, self.inner.top_logprobs(messages=messages, n=n, **kwargs), lp=1)
+
+
+class ReplayLLMClient:
+    """Serves recorded answers for identical requests, in recording order.
+
+    A request recorded several times (e.g. the base agent's retries) gets
+    its answers back in the same order; once they run out the last one
+    repeats. Recorded errors are raised again so fallbacks replay too, and
+    an unrecorded request raises CassetteMiss.
+    """
+
+    def __init__(self, model: str, path: str = DEFAULT_CASSETTE, with_latency: bool = DEFAULT_REPLAY_LATENCY):
+        self.model = model
+        self.path = path
+        self.with_latency = with_latency
+        self.hits = 0
+        self.misses = 0
+        self._answers: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        record = json.loads(line)
+                        self._answers.setdefault(record["k"], []).append(record)
+        # Whether rank mode was recorded through top_logprobs() (else as text through complete()).
+        self.has_logprobs = any("lp" in r for records in self._answers.values() for r in records)
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return await self._serve(request_key(self.model, messages, **kwargs))
+
+    async def _serve(self, key: str) -> Any:
+        records = self._answers.get(key)
+        if not records:
+            self.misses += 1
+            raise CassetteMiss(f"no recorded answer for request {key[:12]}")
+        n = self._served.get(key, 0)
+        self._served[key] = n + 1
+        record = records[min(n, len(records) - 1)]
+        self.hits += 1
+        if self.with_latency:
+            await asyncio.sleep(record.get("t", 0.0))
+        if "e" in record:
+            raise RuntimeError(record["e"])
+        return record["r"]
+
+
+class ReplayLogprobClient:
+    """A ReplayLLMClient with top_logprobs(), for cassettes recorded through RecordingLogprobClient."""
+
+    def __init__(self, replay: ReplayLLMClient):
+        self.replay = replay
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return await self.replay.complete(messages=messages, **kwargs)
+
+    async def top_logprobs(self, messages: List[Dict[str, str]], n: int, **kwargs: Any) -> List[Tuple[str, float]]:
+        response = await self.replay._serve(request_key(self.replay.model, messages, top_logprobs=n, **kwargs))
+        return [(token, logprob) for token, logprob in response]
+
+
+def _schema_entries(schema: str) -> List["re.Match[str]"] | None:
+    """The entries of a flat {"key": value, ...} object, or None if schema is not one."""
+    body, entries, pos = schema[1:-1], [], 0
+    while True:
+        entry = _SCHEMA_ENTRY.match(body, pos)
+        if entry is None:
+            return None
+        entries.append(entry)
+        pos = entry.end()
+        if pos == len(body):
+            return entries
+        if body[pos] != ",":
+            return None
+        pos += 1
+
+
+def move_first(prompt: str) -> str:
+    """prompt with each JSON output schema reordered to give the move keys first, for streaming.
+
+    Entries are moved whole, whatever their values hold; every other
+    entry keeps its order after them, and the layout (indents, line
+    breaks) stays where it was.
+    """
+    def reorder(m: "re.Match[str]") -> str:
+        entries = _schema_entries(m.group(0))
+        if entries is None:
+            return m.group(0)
+        keys = [e.group(3) for e in entries]
+        order = sorted(range(len(entries)),
+                       key=lambda i: (MOVE_KEYS.index(keys[i]) if keys[i] in MOVE_KEYS else len(MOVE_KEYS), i))
+        body = m.group(0)[1:-1]
+        slots = [e.group(1) + entries[i].group(2) + body[e.end(2):e.end()] for e, i in zip(entries, order)]
+        return "{" + ",".join(slots) + "}"
+    return _SCHEMA.sub(reorder, prompt)
+
+
+class MoveStreamParser:
+    """Incremental parse of a streamed answer: the move as soon as its JSON fields are complete."""
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, piece: str) -> Tuple[int, int] | None:
+        self.text += piece
+        body = self.text[self.text.find("{"):] if "{" in self.text else ""
+        if not body:
+            return None
+        m = _MOVE_FIELD.search(body)
+        if m:
+            return int(m.group(2)) - 1, "ABCDEFGH".index(m.group(1).upper())
+        row, col = _ROW_FIELD.search(body), _COL_FIELD.search(body)
+        if row and col:
+            return int(row.group(1)), int(col.group(1))
+        return None
+
+
+class OpenAIStreamSource:
+    """Streams chat completion text from an OpenAI-compatible endpoint (OPENAI_BASE_URL, OPENAI_API_KEY).
+
+    Closing the generator closes the HTTP response, which makes the server
+    stop decoding.
+    """
+
+    def __init__(self, model: str):
+        from openai import AsyncOpenAI
+        self.model = model
+        self.client = AsyncOpenAI()
+
+    async def stream(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(model=self.model, messages=messages, stream=True,
+                                                             **kwargs)
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+
+class OpenAILogprobClient:
+    """Adds top_logprobs() from an OpenAI-compatible endpoint to the agents' client, for rank mode."""
+
+    def __init__(self, inner: Any, model: str):
+        from openai import AsyncOpenAI
+        self.inner = inner
+        self.model = model
+        self.client = AsyncOpenAI()
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return await self.inner.complete(messages=messages, **kwargs)
+
+    async def top_logprobs(self, messages: List[Dict[str, str]], n: int, **kwargs: Any) -> List[Tuple[str, float]]:
+        """The top n (token, log-probability) pairs for the first answer token."""
+        response = await self.client.chat.completions.create(model=self.model, messages=messages, max_tokens=1,
+                                                             logprobs=True, top_logprobs=n, **kwargs)
+        logprobs = response.choices[0].logprobs
+        if logprobs is None or not logprobs.content:
+            return []
+        return [(t.token, t.logprob) for t in logprobs.content[0].top_logprobs]
+
+
+class StreamingMoveClient:
+    """complete() over a streaming source that stops reading once the answer's move is decoded.
+
+    A decoded move ends the stream at once and comes back as
+    {"row": r, "col": c}, so the agents' parsers and legality checks are
+    unchanged; it is also checked against the board in the prompt, so the
+    counters tell early legal answers from illegal ones. An answer without
+    a decodable move is read to the end and returned as is. Each call
+    records its time to move and the stream chunks (about one token each)
+    it read.
+    """
+
+    def __init__(self, source: Any):
+        self.source = source
+        self.calls: deque = deque(maxlen=1000)
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        board = extract_board(user) or extract_board("\n".join(m["content"] for m in messages))
+        parser = MoveStreamParser()
+        start = time.perf_counter()
+        call = {"tokens": 0, "max_tokens": kwargs.get("max_tokens"), "early": False, "illegal": False}
+        self.calls.append(call)
+        chunks = self.source.stream(messages=messages, **kwargs)
+        try:
+            async for piece in chunks:
+                call["tokens"] += 1
+                move = parser.feed(piece)
+                if move is None:
+                    continue
+                r, c = move
+                legal = 0 <= r < 8 and 0 <= c < 8 and (board is None or board.is_empty(r, c))
+                # A decided move ends the stream either way: the rest is only its explanation.
+                call["early" if legal else "illegal"] = True
+                call["time_to_move"] = time.perf_counter() - start
+                return json.dumps({"row": r, "col": c})
+        finally:
+            await chunks.aclose()
+            call["elapsed"] = time.perf_counter() - start
+        call["time_to_move"] = call["elapsed"]
+        return parser.text
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, early stops, p50/p95 time to move and tokens read; saved tokens are bounded by max_tokens."""
+        calls = self.calls
+        out: Dict[str, Any] = {"calls": len(calls), "early": sum(c["early"] for c in calls),
+                               "illegal": sum(c["illegal"] for c in calls)}
+        ttm = sorted(c["time_to_move"] for c in calls if "time_to_move" in c)
+        if ttm:
+            for p in (50, 95):
+                out[f"time_to_move_p{p}_ms"] = ttm[max(0, math.ceil(p / 100 * len(ttm)) - 1)] * 1000
+            out["tokens_per_call"] = sum(c["tokens"] for c in calls) / len(calls)
+            out["tokens_saved_max"] = sum(c["max_tokens"] - c["tokens"] for c in calls
+                                          if (c["early"] or c["illegal"]) and c["max_tokens"])
+        return out
+
+
+def make_llm_client(client_cls: Callable[..., Any], model: str, mode: str = DEFAULT_LLM_MODE,
+                    path: str = DEFAULT_CASSETTE, stream: bool = DEFAULT_LLM_STREAM, logprobs: bool = False) -> Any:
+    """Build the agents' LLM client: client_cls(model=model) wrapped for the chosen mode.
+
+    client_cls is normally gomoku.llm.OpenAIGomokuClient. Replay mode never
+    constructs it, so replayed games need neither network nor API key.
+    With stream, answers are streamed through the openai package instead
+    (falling back to client_cls when it is not installed). With logprobs
+    the client also gets top_logprobs() through the openai package, for
+    rank mode; without it rank mode asks for the candidate number as text.
+    Record mode captures top_logprobs() calls as well, and replay offers
+    top_logprobs() only when the cassette holds some, so a replayed rank
+    move takes the path it was recorded on.
+    """
+    if mode == "replay":
+        replay = ReplayLLMClient(model, path)
+        # Rank mode replays the path it was recorded on: log-probabilities if the cassette has them, else text.
+        return ReplayLogprobClient(replay) if logprobs and replay.has_logprobs else replay
+    client = None
+    if stream:
+        try:
+            client = StreamingMoveClient(OpenAIStreamSource(model))
+        except ImportError:
+            print("VISHAL_GOMOKU_LLM_STREAM needs the openai package; using the non-streaming client")
+    if client is None:
+        client = client_cls(model=model)
+    if logprobs:
+        try:
+            client = OpenAILogprobClient(client, model)
+        except ImportError:
+            pass
+    if mode == "record":
+        # Recorded outermost, so ranked calls reach the cassette like every other call.
+        recording = RecordingLogprobClient if hasattr(client, "top_logprobs") else RecordingLLMClient
+        client = recording(client, model, path)
+    return client
+
+
+async def _ask_all(agent: Any, boards: List[Tuple[Any, str]]) -> List[float]:
+    latencies = []
+    for board, player in boards:
+        opp = 'O' if player == 'X' else 'X'
+        start = time.perf_counter()
+        await agent._ask_llm(board, board.to_standard(), player, opp, board.legal_moves())
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+# Schemas move_first() must handle besides the agents' own: commas and escaped quotes in values,
+# other key orders, extra keys, and braces that are not a schema at all.
+_SCHEMA_CASES = [
+    '{"reasoning": "block the four, then extend", "row": <int>, "col": <int>}',
+    '{\n  "col": <number>,\n  "reasoning": "why, briefly",\n  "row": <number>\n}',
+    '{"threat": "open three", "reasoning": "say \\"why\\", in short", "col": <int>, "row": <int>}',
+    'Pick one of {A1, B2} and answer {"why": "...", "move": "D4"}',
+]
+
+
+def check_move_first(prompts: List[Tuple[str, str]]) -> List[str]:
+    """(name, prompt) pairs whose reordered schema lost or altered an entry or does not lead with the move."""
+    problems = []
+    for name, prompt in prompts:
+        reordered = move_first(prompt)
+        if _SCHEMA.split(prompt) != _SCHEMA.split(reordered):
+            problems.append(f"{name}: text outside the schema changed")
+            continue
+        found = False
+        for before, after in zip(_SCHEMA.findall(prompt), _SCHEMA.findall(reordered)):
+            old, new = _schema_entries(before), _schema_entries(after)
+            if old is None:
+                if before != after:
+                    problems.append(f"{name}: {before!r} is not a schema but became {after!r}")
+                continue
+            if new is None or sorted(e.group(2) for e in old) != sorted(e.group(2) for e in new):
+                problems.append(f"{name}: entries of {before!r} changed in {after!r}")
+                continue
+            keys = [e.group(3) for e in new]
+            moves = sorted((k for k in keys if k in MOVE_KEYS), key=MOVE_KEYS.index)
+            found = found or bool(moves)
+            if keys[:len(moves)] != moves:
+                problems.append(f"{name}: {after!r} does not lead with {moves}")
+        if not found and ('"row"' in prompt or '"move"' in prompt):
+            problems.append(f"{name}: no output schema found")
+    return problems
+
+
+def main() -> None:
+    from vishal_gomoku_bench import AGENTS, _make_agent, build_corpus
+    from vishal_gomoku_llm_server import StandInClient, StandInConfig
+
+    parser = argparse.ArgumentParser(description="Time to move and tokens decoded: whole answers vs early-cancelled streams")
+    parser.add_argument("--agents", nargs="*", help=f"subset of {[a[0] for a in AGENTS]}")
+    parser.add_argument("--latency", type=float, default=0.2, help="stand-in time to first token, seconds")
+    parser.add_argument("--decode-ms", type=float, default=20.0, help="stand-in time per answer token, ms")
+    parser.add_argument("--reasoning-words", type=int, default=40, help="length of the stand-in's explanation")
+    parser.add_argument("--positions", type=int, default=12)
+    parser.add_argument("--check", action="store_true",
+                        help="check move_first() on every agent's system prompt, then exit (1 on a problem)")
+    args = parser.parse_args()
+    if args.check:
+        from vishal_gomoku_prompt import SYSTEM_PROMPTS
+        with contextlib.redirect_stdout(io.StringIO()):
+            prompts = [(name, _make_agent(module, cls, 0.0).system_prompt) for name, module, cls in AGENTS]
+        prompts += [(f"compact {mode}", prompt) for mode, prompt in SYSTEM_PROMPTS.items()]
+        prompts += [(f"case {i}", case) for i, case in enumerate(_SCHEMA_CASES)]
+        problems = check_move_first(prompts)
+        for line in problems:
+            print(line)
+        print(f"move_first: {len(problems)} problems over {len(prompts)} prompts")
+        sys.exit(1 if problems else 0)
+
+    boards = [(board, player) for _, board, player in build_corpus() if board.empty_mask()][:args.positions]
+    print(f"{'agent':8} {'client':18} {'p50 ms':>8} {'p95 ms':>8} {'tok/call':>9} {'saved/call':>11}")
+    for name, module, cls in AGENTS:
+        if args.agents and name not in args.agents:
+            continue
+        for label in ("complete", "stream", "stream move-first"):
+            config = StandInConfig("random", args.latency, decode_per_token=args.decode_ms / 1000,
+                                   reasoning_words=args.reasoning_words, seed=7)
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = _make_agent(module, cls, 0.0)
+                agent.llm = StandInClient(config) if label == "complete" else StreamingMoveClient(StandInClient(config))
+                if label == "stream move-first":
+                    agent.system_prompt = move_first(agent.system_prompt)
+                latencies = asyncio.run(_ask_all(agent, boards))
+            requests = max(1, config.stats["requests"])
+            p95 = latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)]
+            print(f"{name:8} {label:18} {latencies[len(latencies) // 2] * 1000:8.0f} {p95 * 1000:8.0f} "
+                  f"{config.stats['decoded_tokens'] / requests:9.1f} {config.stats['cancelled_tokens'] / requests:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Tuple
+from vishal_gomoku_bitboard import BitBoard, canonical, inverse_move, transform_move
+from vishal_gomoku_llm import DEFAULT_LLM_MODE
+
+# One sqlite file shared by every agent and worker process; "" disables the cache. Record and
+# replay modes must see every request (a hit would never reach the cassette), so it is off there.
+DEFAULT_LLM_CACHE_PATH = "" if DEFAULT_LLM_MODE in ("record", "replay") else os.environ.get(
+    "VISHAL_GOMOKU_LLM_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "vishal_gomoku", "llm_cache.sqlite"),
+)
+DEFAULT_LLM_CACHE_ENTRIES = int(os.environ.get("VISHAL_GOMOKU_LLM_CACHE_ENTRIES", "100000"))
+# Bump when code that shapes a prompt changes (the compact, annotated and rank encoders, the
+# fields filled into a template): those edits do not show up in the hashed prompt text.
+PROMPT_FORMAT_VERSION = "2"
+# Puts between size checks; each check that finds the store over its cap trims it to 90%.
+EVICT_EVERY = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS moves (
+    model TEXT NOT NULL,
+    version TEXT NOT NULL,
+    position TEXT NOT NULL,
+    side TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (model, version, position, side)
+);
+CREATE INDEX IF NOT EXISTS moves_lru ON moves (last_used);
+"""
+
+
+def prompt_version(*parts: str) -> str:
+    """Short digest of the prompt pieces and PROMPT_FORMAT_VERSION; a change to any starts a fresh namespace."""
+    return hashlib.sha1("\x00".join((PROMPT_FORMAT_VERSION,) + parts).encode()).hexdigest()[:12]
+
+
+class LLMMoveCache:
+    """Persistent cache of validated LLM moves, keyed by (model, prompt version, canonical position, side).
+
+    Positions are stored in their symmetry-canonical frame, so a hit on a
+    rotated or mirrored repeat comes back mapped onto the current board.
+    The store is a single sqlite file in WAL mode that concurrent worker
+    processes can share. Every EVICT_EVERY puts the row count is checked, and
+    a store past max_entries drops its least recently used rows down to 90%
+    of the cap in one batch. Any sqlite error is treated as a miss - the cache never breaks
+    a move.
+    """
+
+    def __init__(self, model: str, version: str, path: str = DEFAULT_LLM_CACHE_PATH,
+                 max_entries: int = DEFAULT_LLM_CACHE_ENTRIES):
+        self.model = model
+        self.version = version
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._puts_since_check = 0
+        self._db: sqlite3.Connection | None = None
+        self._pid = 0
+
+    def _conn(self) -> sqlite3.Connection | None:
+        if not self.path:
+            return None
+        # A connection must not cross a fork; reopen in each worker process.
+        if self._db is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _key(self, board: BitBoard) -> Tuple[str, int]:
+        x, o, t = canonical(board.x, board.o)
+        return f"{x:016x}{o:016x}", t
+
+    def get(self, board: BitBoard, player: str) -> Tuple[int, int] | None:
+        """Cached move for player on board, mapped onto this board's orientation."""
+        try:
+            db = self._conn()
+            if db is None:
+                return None
+            position, t = self._key(board)
+            row = db.execute(
+                "SELECT row, col FROM moves WHERE model = ? AND version = ? AND position = ? AND side = ?",
+                (self.model, self.version, position, player),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute(
+                "UPDATE moves SET last_used = ?, hits = hits + 1"
+                " WHERE model = ? AND version = ? AND position = ? AND side = ?",
+                (time.time(), self.model, self.version, position, player),
+            )
+        except (sqlite3.Error, OSError) as e:
+            print(f"LLM cache error: {e}")
+            return None
+        self.hits += 1
+        return inverse_move(row[0], row[1], t)
+
+    def put(self, board: BitBoard, player: str, move: Tuple[int, int]) -> None:
+        """Remember a validated LLM move; every EVICT_EVERY puts, trim the store if it is past max_entries."""
+        try:
+            db = self._conn()
+            if db is None:
+                return
+            position, t = self._key(board)
+            r, c = transform_move(move[0], move[1], t)
+            db.execute(
+                "INSERT OR REPLACE INTO moves (model, version, position, side, row, col, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.model, self.version, position, player, r, c, time.time()),
+            )
+            self._puts_since_check += 1
+            if self._puts_since_check >= min(EVICT_EVERY, max(1, self.max_entries // 10)):
+                self._puts_since_check = 0
+                self._evict(db)
+        except (sqlite3.Error, OSError) as e:
+            print(f"LLM cache error: {e}")
+            return
+        self.stores += 1
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        """Drop the least recently used rows down to 90% of max_entries, if the store is past the cap."""
+        (entries,) = db.execute("SELECT COUNT(*) FROM moves").fetchone()
+        if entries <= self.max_entries:
+            return
+        db.execute(
+            "DELETE FROM moves WHERE rowid IN (SELECT rowid FROM moves ORDER BY last_used LIMIT ?)",
+            (entries - self.max_entries * 9 // 10,),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """This process's hit rate plus the shared store's size and lifetime hits."""
+        lookups = self.hits + self.misses
+        report: Dict[str, Any] = {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+        }
+        try:
+            db = self._conn()
+            if db is not None:
+                entries, lifetime = db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM moves").fetchone()
+                report.update(entries=entries, lifetime_hits=lifetime, max_entries=self.max_entries)
+        except (sqlite3.Error, OSError):
+            pass
+        return report
+
+    def close(self) -> None:
+        if self._db is not None and self._pid == os.getpid():
+            self._db.close()
+        self._db = None
@@ -0,0 +1,489 @@
+"""Local OpenAI-compatible stand-in for the agents' LLM.
+
+Speaks POST /v1/chat/completions on localhost and answers with a legal
+move for the board found in the last user message, so get_move() can be
+load-tested without a GPU or network. Point the client at it with
+OPENAI_BASE_URL=http://127.0.0.1:8000/v1 (any OPENAI_API_KEY works).
+
+    python vishal_gomoku_llm_server.py --mode engine --latency 0.8 --latency-dist lognormal \
+        --malformed-rate 0.05 --rate-429 0.02 --timeout-rate 0.01 --timeout-seconds 30
+
+Rank prompts (a numbered candidate list) are answered with a number, and
+with "logprobs": true the top_logprobs over the candidates are returned.
+--prefill-ms adds latency per prompt token, except for a system prompt
+the server has already seen (prefix caching), and --decode-ms per answer
+token; "stream": true requests are answered as server-sent events. GET /stats returns request
+and token counters. StandInClient answers the same way
+in-process, for benchmarks that should not open sockets. --check
+verifies that a logprobs answer is the top token returned with it.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from vishal_gomoku_bitboard import BitBoard
+from vishal_gomoku_prompt import cell_label, estimate_tokens, parse_label
+from vishal_gomoku_search import SearchEngine
+
+# A board row as the agents' prompts print it: optional row label, then 8 cells.
+_ROW = re.compile(r"^\s*(?:\d+\s*[:|]?\s+)?((?:[XO.]\s*){8})\s*$")
+# Stream pieces: a word or punctuation mark with its leading space, about one token each.
+_PIECE = re.compile(r"\s*\w+|\s*[^\w\s]|\s+$")
+# A numbered candidate line of a rank prompt ("3 D4").
+_CANDIDATE = re.compile(r"^(\d) ([A-H][1-8])$", re.MULTILINE)
+# A tagged candidate line of an annotated prompt ("D4: blocks O open three (down)").
+_TAGGED = re.compile(r"^([A-H][1-8]): ", re.MULTILINE)
+# Answers an agent's parser has to survive: truncated, prose, wrong schema, wrong types.
+_MALFORMED = ['{"row": 3, "col":', 'I think the best move is the centre.',
+              '{"move": "centre"}', '```json\n{"row": "three"}\n```']
+
+
+def extract_board(text: str) -> BitBoard | None:
+    """First block of 8 consecutive board rows in a prompt."""
+    rows: List[str] = []
+    for line in text.split('\n'):
+        m = _ROW.match(line)
+        if m:
+            rows.append(m.group(1).replace(' ', ''))
+            if len(rows) == 8:
+                return BitBoard.from_string('\n'.join(rows))
+        else:
+            rows = []
+    return None
+
+
+def side_to_move(text: str, board: BitBoard) -> str:
+    """Side named in the prompt ("You: X", "You are: O", "Current player: X"), else by stone parity."""
+    m = re.search(r"(?:You(?: are)?|Current player)\s*:\s*([XO])", text)
+    if m:
+        return m.group(1)
+    return 'X' if board.x.bit_count() <= board.o.bit_count() else 'O'
+
+
+class StandInConfig:
+    def __init__(self, mode: str = "random", latency: float = 0.0, latency_dist: str = "fixed",
+                 latency_sigma: float = 0.5, malformed_rate: float = 0.0, rate_429: float = 0.0,
+                 timeout_rate: float = 0.0, timeout_seconds: float = 30.0, engine_time: float = 0.1,
+                 seed: int | None = None, prefill_per_token: float = 0.0, prefix_cache: bool = True,
+                 decode_per_token: float = 0.0, reasoning_words: int = 0):
+        self.mode = mode
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+        self.malformed_rate = malformed_rate
+        self.rate_429 = rate_429
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.engine_time = engine_time
+        self.prefill_per_token = prefill_per_token
+        self.prefix_cache = prefix_cache
+        self.prefixes: set = set()
+        self.decode_per_token = decode_per_token
+        self.reasoning_words = reasoning_words
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "malformed": 0, "rate_limited": 0, "timeouts": 0, "no_board": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0, "decoded_tokens": 0, "cancelled_tokens": 0}
+
+    def sample_latency(self) -> float:
+        mean = self.latency
+        if mean <= 0:
+            return 0.0
+        with self.lock:
+            if self.latency_dist == "uniform":
+                return self.rng.uniform(0.0, 2 * mean)
+            if self.latency_dist == "exp":
+                return self.rng.expovariate(1.0 / mean)
+            if self.latency_dist == "lognormal":
+                # Heavy tail with the requested mean: exp(N(log(mean) - s^2/2, s)).
+                s = self.latency_sigma
+                return self.rng.lognormvariate(math.log(mean) - s * s / 2, s)
+        return mean
+
+    def prefill_latency(self, messages: List[Dict[str, Any]]) -> float:
+        """Prompt-processing time: prefill_per_token for each token not served from the prefix cache.
+
+        A system message seen before counts as cached, as with server-side
+        prefix caching of a stable leading prompt.
+        """
+        total = cached = 0
+        for m in messages:
+            tokens = estimate_tokens(str(m.get("content", "")))
+            total += tokens
+            if m.get("role") == "system" and self.prefix_cache:
+                with self.lock:
+                    if m.get("content") in self.prefixes:
+                        cached += tokens
+                    self.prefixes.add(m.get("content"))
+        self.count("prompt_tokens", total)
+        self.count("cached_tokens", cached)
+        return (total - cached) * self.prefill_per_token
+
+    def pieces(self, content: str, max_tokens: int | None = None) -> List[str]:
+        """content split into stream pieces (about one token each), cut at max_tokens as a server would."""
+        pieces = _PIECE.findall(content)
+        return pieces[:max_tokens] if max_tokens else pieces
+
+    def roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    def malformed_answer(self) -> str:
+        with self.lock:
+            return self.rng.choice(_MALFORMED)
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += n
+
+    def choose_move(self, board: BitBoard, player: str) -> Tuple[int, int] | None:
+        legal = board.legal_moves()
+        if not legal:
+            return None
+        if self.mode == "engine":
+            # One engine per request: SearchEngine keeps per-search state.
+            move = SearchEngine().search(board, player, self.engine_time).move
+            if move is not None:
+                return move
+        with self.lock:
+            return self.rng.choice(legal)
+
+    def rank(self, messages: List[Dict[str, Any]], n: int) -> List[Tuple[str, float]] | None:
+        """Top-n (candidate number, log-probability) for a rank prompt; None for any other prompt.
+
+        The candidate this stand-in would play (its mode's move if listed,
+        else a random one) gets 60% of the mass, the rest is spread at
+        random.
+        """
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        options = _CANDIDATE.findall(prompt)
+        board = extract_board(prompt)
+        if not options or board is None:
+            return None
+        move = self.choose_move(board, side_to_move(prompt, board))
+        numbers = [number for number, label in options]
+        picked = next((number for number, label in options if parse_label(label) == move), None)
+        with self.lock:
+            picked = picked or self.rng.choice(numbers)
+            rest = [self.rng.random() + 1e-3 for _ in numbers]
+        others = sum(r for number, r in zip(numbers, rest) if number != picked)
+        probs = {number: 0.6 if number == picked else 0.4 * r / others for number, r in zip(numbers, rest)}
+        top = sorted(probs.items(), key=lambda item: -item[1])[:n]
+        return [(number, math.log(p)) for number, p in top]
+
+    def answer(self, messages: List[Dict[str, Any]]) -> str:
+        """Reply text for a chat request: a legal move as JSON for the board in the prompt, or a malformed answer."""
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+        if self.roll(self.malformed_rate):
+            self.count("malformed")
+            return self.malformed_answer()
+        ranked = self.rank(messages, 1)
+        if ranked:
+            self.count("ok")
+            return ranked[0][0]  # a rank prompt is answered with a candidate number
+        # Retry prompts carry no board; fall back to the first one in the conversation.
+        board = extract_board(user) or extract_board(prompt)
+        if board is None:
+            self.count("no_board")
+            return '{"row": 3, "col": 3}'
+        move = self.choose_move(board, side_to_move(prompt, board))
+        self.count("ok")
+        if move is None:
+            return '{"row": 0, "col": 0, "reasoning": "board full"}'
+        if '{"move":' in prompt:
+            listed = [parse_label(label) for label in _TAGGED.findall(prompt)]
+            if listed and move not in listed:
+                with self.lock:
+                    move = self.rng.choice(listed)  # an annotated prompt: pick among its candidates
+            return json.dumps({"move": cell_label(*move)})  # the compact prompt's reply schema
+        reasoning = " ".join([f"stand-in {self.mode} move"] + ["because"] * self.reasoning_words)
+        if 0 <= prompt.find('"reasoning"') < prompt.find('"row"'):
+            # The prompt's schema asks for the explanation first, so the move comes last.
+            return json.dumps({"reasoning": reasoning, "row": move[0], "col": move[1]})
+        return json.dumps({"row": move[0], "col": move[1], "reasoning": reasoning})
+
+    def reply(self, messages: List[Dict[str, Any]],
+              top_n: int = 0) -> Tuple[str, List[Tuple[str, float]] | None]:
+        """Reply text plus, for a rank prompt asked top_n logprobs, the ranking it came from.
+
+        Both come from one draw: the text of such a reply is its top token,
+        as a greedy model's would be.
+        """
+        if top_n:
+            ranked = self.rank(messages, top_n)
+            if ranked:
+                self.count("ok")
+                return ranked[0][0], ranked
+        return self.answer(messages), None
+
+
+def _top_n(request: Dict[str, Any]) -> int:
+    """How many top logprobs a request asks for; 0 without "logprobs"."""
+    return int(request.get("top_logprobs") or 1) if request.get("logprobs") else 0
+
+
+class StandInClient:
+    """The stand-in in-process: same answers, latency and failure model, no sockets.
+
+    Matches the agents' client interface (await complete(messages=...)); a
+    429 or a hang surfaces as the exception or the delay a real client sees.
+    """
+
+    def __init__(self, config: StandInConfig | None = None):
+        self.config = config or StandInConfig()
+
+    async def complete(self, messages: List[Dict[str, Any]], **kwargs: Any) -> str:
+        config = self.config
+        config.count("requests")
+        if config.roll(config.rate_429):
+            config.count("rate_limited")
+            raise RuntimeError("429 Rate limit reached")
+        if config.roll(config.timeout_rate):
+            config.count("timeouts")
+            await asyncio.sleep(config.timeout_seconds)
+        await asyncio.sleep(config.sample_latency() + config.prefill_latency(messages))
+        pieces = config.pieces(config.reply(messages, _top_n(kwargs))[0], kwargs.get("max_tokens"))
+        config.count("decoded_tokens", len(pieces))
+        await asyncio.sleep(len(pieces) * config.decode_per_token)
+        return "".join(pieces)
+
+    async def top_logprobs(self, messages: List[Dict[str, Any]], n: int, **kwargs: Any) -> List[Tuple[str, float]]:
+        """One-token answer's top-n (token, log-probability) pairs; empty for a prompt that is not a rank prompt."""
+        config = self.config
+        config.count("requests")
+        if config.roll(config.rate_429):
+            config.count("rate_limited")
+            raise RuntimeError("429 Rate limit reached")
+        await asyncio.sleep(config.sample_latency() + config.prefill_latency(messages) + config.decode_per_token)
+        config.count("decoded_tokens")
+        return config.reply(messages, n)[1] or []
+
+    async def stream(self, messages: List[Dict[str, Any]], **kwargs: Any) -> AsyncIterator[str]:
+        """The same answer piece by piece, decode_per_token apart; pieces never read count as cancelled."""
+        config = self.config
+        config.count("requests")
+        if config.roll(config.rate_429):
+            config.count("rate_limited")
+            raise RuntimeError("429 Rate limit reached")
+        if config.roll(config.timeout_rate):
+            config.count("timeouts")
+            await asyncio.sleep(config.timeout_seconds)
+        await asyncio.sleep(config.sample_latency() + config.prefill_latency(messages))
+        pieces = config.pieces(config.reply(messages, _top_n(kwargs))[0], kwargs.get("max_tokens"))
+        sent = 0
+        try:
+            for piece in pieces:
+                await asyncio.sleep(config.decode_per_token)
+                sent += 1
+                yield piece
+        finally:
+            config.count("decoded_tokens", sent)
+            config.count("cancelled_tokens", len(pieces) - sent)
+
+
+def _completion(model: str, content: str, prompt_tokens: int) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        # Estimated counts; nothing downstream bills on them.
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(content),
+                  "total_tokens": prompt_tokens + estimate_tokens(content)},
+    }
+
+
+def make_handler(config: StandInConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path.rstrip('/').endswith("/models"):
+                self._send(200, {"object": "list", "data": [{"id": "stand-in", "object": "model"}]})
+            elif self.path.rstrip('/') == "/stats":
+                with config.lock:
+                    self._send(200, dict(config.stats))
+            else:
+                self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self) -> None:
+            if not self.path.rstrip('/').endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send(400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+                return
+            config.count("requests")
+            if config.roll(config.rate_429):
+                config.count("rate_limited")
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                           {"Retry-After": "1"})
+                return
+            if config.roll(config.timeout_rate):
+                config.count("timeouts")
+                time.sleep(config.timeout_seconds)
+            messages = request.get("messages") or []
+            time.sleep(config.sample_latency() + config.prefill_latency(messages))
+
+            prompt = "\n".join(str(m.get("content", "")) for m in messages)
+            # With logprobs the content is the top token of the same ranking, never a second draw.
+            content, ranked = config.reply(messages, _top_n(request))
+            pieces = config.pieces(content, request.get("max_tokens"))
+            if request.get("stream"):
+                self._stream(request.get("model", "stand-in"), pieces)
+                return
+            config.count("decoded_tokens", len(pieces))
+            time.sleep(len(pieces) * config.decode_per_token)
+            content = "".join(pieces)
+            body = _completion(request.get("model", "stand-in"), content, estimate_tokens(prompt))
+            if ranked:
+                top = [{"token": token, "logprob": logprob} for token, logprob in ranked]
+                body["choices"][0]["logprobs"] = {"content": [dict(top[0], top_logprobs=top)]}
+            self._send(200, body)
+
+        def _stream(self, model: str, pieces: List[str]) -> None:
+            """Server-sent events, one chunk per piece; a client that hangs up stops the decoding."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            chunk_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            sent = 0
+            try:
+                for piece in pieces:
+                    time.sleep(config.decode_per_token)
+                    chunk = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model, "choices": [{"index": 0, "delta": {"content": piece},
+                                                          "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    sent += 1
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                config.count("decoded_tokens", sent)
+                config.count("cancelled_tokens", len(pieces) - sent)
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, config: StandInConfig | None = None) -> ThreadingHTTPServer:
+    """Start the stand-in server on a background thread and return it (call shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config or StandInConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_logprobs(positions: int = 200, seed: int = 0) -> List[str]:
+    """Rank requests with logprobs whose content is not the top token returned with it, one line each."""
+    from urllib.request import Request, urlopen
+    from vishal_gomoku_bench import _random_position
+    from vishal_gomoku_prompt import candidates
+    from vishal_gomoku_rank import rank_messages
+
+    rng = random.Random(seed)
+    server = serve(port=0, config=StandInConfig(seed=seed))
+    host, port = server.server_address[:2]
+    client = StandInClient(StandInConfig(seed=seed))
+    problems = []
+    try:
+        for _ in range(positions):
+            board, player = _random_position(rng, rng.randrange(0, 40))
+            options = candidates(board, player, board.legal_moves(), 6)
+            if len(options) < 2:
+                continue
+            messages = rank_messages(board, player, options)
+            request = {"model": "stand-in", "messages": messages, "max_tokens": 1,
+                       "logprobs": True, "top_logprobs": len(options)}
+            with urlopen(Request(f"http://{host}:{port}/v1/chat/completions", json.dumps(request).encode(),
+                                 {"Content-Type": "application/json"})) as response:
+                choice = json.load(response)["choices"][0]
+            top = choice["logprobs"]["content"][0]["top_logprobs"]
+            if choice["message"]["content"] != top[0]["token"]:
+                problems.append(f"server: content {choice['message']['content']!r}, top token {top[0]['token']!r}")
+            content, ranked = client.config.reply(messages, len(options))
+            if not ranked or content != ranked[0][0]:
+                problems.append(f"StandInClient: content {content!r}, top token {ranked and ranked[0][0]!r}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in LLM for load-testing the Gomoku agents")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mode", choices=["random", "engine"], default="random",
+                        help="random legal move, or the alpha-beta engine's choice")
+    parser.add_argument("--engine-time", type=float, default=0.1, help="engine budget per request, seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean added latency, seconds")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exp", "lognormal"], default="fixed")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape (bigger = heavier tail)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of answers that are not valid move JSON")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests rejected with 429")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of requests that hang")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0, help="how long a hanging request stalls")
+    parser.add_argument("--prefill-ms", type=float, default=0.0, help="added latency per uncached prompt token, ms")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="charge repeated system prompts too")
+    parser.add_argument("--decode-ms", type=float, default=0.0, help="added latency per answer token, ms")
+    parser.add_argument("--reasoning-words", type=int, default=0, help="extra words of reasoning in each answer")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--check", action="store_true",
+                        help="check that logprob answers agree with their top token, then exit (1 on a mismatch)")
+    args = parser.parse_args()
+    if args.check:
+        problems = check_logprobs(seed=args.seed or 0)
+        for line in problems[:20]:
+            print(line)
+        print(f"logprobs: {len(problems)} mismatches")
+        sys.exit(1 if problems else 0)
+    config = StandInConfig(args.mode, args.latency, args.latency_dist, args.latency_sigma, args.malformed_rate,
+                           args.rate_429, args.timeout_rate, args.timeout_seconds, args.engine_time, args.seed,
+                           args.prefill_ms / 1000, not args.no_prefix_cache, args.decode_ms / 1000,
+                           args.reasoning_words)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"Stand-in LLM on http://{args.host}:{args.port}/v1 (mode={args.mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
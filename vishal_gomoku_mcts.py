@@ -0,0 +1,218 @@
+import atexit
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from vishal_gomoku_bitboard import BitBoard, bit_cells
+from vishal_gomoku_search import CENTER, SearchResult, neighbourhood
+from vishal_gomoku_threats import ThreatState
+
+DEFAULT_PLAYOUTS = int(os.environ.get("VISHAL_GOMOKU_MCTS_PLAYOUTS", "20000"))
+DEFAULT_WORKERS = int(os.environ.get("VISHAL_GOMOKU_MCTS_WORKERS", str(os.cpu_count() or 1)))
+
+# The engine's stop Event inside a pool worker, handed over when the worker starts
+# (a process-shared Event cannot be pickled into submit()).
+_worker_stopped = None
+
+
+def _init_worker(stopped) -> None:
+    global _worker_stopped
+    _worker_stopped = stopped
+
+
+class _Node:
+    __slots__ = ("move", "parent", "children", "untried", "visits", "wins", "mover")
+
+    def __init__(self, move: Tuple[int, int] | None, parent: "_Node | None", mover: str, untried: List[Tuple[int, int]]):
+        self.move = move
+        self.parent = parent
+        self.children: List[_Node] = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.mover = mover  # side that played `move`
+
+
+def _tactical_moves(state: ThreatState, player: str, opp: str, radius: int) -> List[Tuple[int, int]]:
+    """The win/block rules of _get_strategic_move, then the stones' neighbourhood."""
+    wins = state.winning_cells(player)
+    if wins:
+        return bit_cells(wins)[:1]
+    blocks = state.winning_cells(opp)
+    if blocks:
+        return bit_cells(blocks)
+    board = state.board
+    occupied = board.occupied()
+    if not occupied:
+        return bit_cells(CENTER)
+    return bit_cells(neighbourhood(occupied, radius) & board.empty_mask())
+
+
+def _playout(state: ThreatState, player: str, rng: random.Random) -> str | None:
+    """Play to the end with win-now / block-now / random-nearby moves; return the winner."""
+    placed = 0
+    winner = None
+    while True:
+        opp = 'O' if player == 'X' else 'X'
+        if state.fours[player]:
+            winner = player
+            break
+        blocks = state.winning_cells(opp)
+        if blocks & (blocks - 1):
+            winner = opp
+            break
+        if blocks:
+            r, c = bit_cells(blocks)[0]
+        else:
+            empty = state.board.empty_mask()
+            if not empty:
+                break
+            near = neighbourhood(state.board.occupied(), 1) & empty
+            r, c = rng.choice(bit_cells(near or empty))
+        state.place(r, c, player)
+        placed += 1
+        player = opp
+    for _ in range(placed):
+        state.undo()
+    return winner
+
+
+def _run_tree(x: int, o: int, player: str, playouts: int, time_budget: float,
+              seed: int, exploration: float, stopped=None) -> Dict[Tuple[int, int], Tuple[int, float]]:
+    """One independent UCT tree from the root; returns {move: (visits, wins)} for the root's children.
+
+    Playouts end at the budget, the deadline or once stopped (the worker's Event by default) is set.
+    """
+    if stopped is None:
+        stopped = _worker_stopped
+    rng = random.Random(seed)
+    state = ThreatState(BitBoard(x, o))
+    opp = 'O' if player == 'X' else 'X'
+    root = _Node(None, None, opp, _tactical_moves(state, player, opp, 2))
+    rng.shuffle(root.untried)
+    deadline = time.perf_counter() + time_budget
+    done = 0
+    while done < playouts and (done & 15 or (time.perf_counter() < deadline
+                                             and not (stopped is not None and stopped.is_set()))):
+        node, to_move, depth = root, player, 0
+        # Selection
+        while not node.untried and node.children:
+            log_n = math.log(node.visits)
+            node = max(node.children, key=lambda ch: ch.wins / ch.visits + exploration * math.sqrt(log_n / ch.visits))
+            state.place(node.move[0], node.move[1], node.mover)
+            depth += 1
+            to_move = 'O' if node.mover == 'X' else 'X'
+        # Expansion
+        if node.untried:
+            move = node.untried.pop()
+            state.place(move[0], move[1], to_move)
+            depth += 1
+            nxt = 'O' if to_move == 'X' else 'X'
+            # A finished game is a leaf: nothing left to try below it.
+            untried = [] if state.has_five(to_move) else _tactical_moves(state, nxt, to_move, 2)
+            child = _Node(move, node, to_move, untried)
+            rng.shuffle(child.untried)
+            node.children.append(child)
+            node, to_move = child, nxt
+        # Simulation
+        if node.move is not None and state.has_five(node.mover):
+            winner = node.mover
+        else:
+            winner = _playout(state, to_move, rng)
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.mover:
+                node.wins += 1.0
+            elif winner is None:
+                node.wins += 0.5
+            node = node.parent
+        for _ in range(depth):
+            state.undo()
+        done += 1
+    return {child.move: (child.visits, child.wins) for child in root.children}
+
+
+class MCTSEngine:
+    """UCT Monte Carlo tree search with root parallelism over a process pool.
+
+    Each worker grows its own tree from the root with a different seed and
+    the root visit counts are summed; the most visited move is played.
+    Playouts use the cascade's win-now / block-now rules, so forced lines are
+    played out correctly. search(), stop() and resume() match SearchEngine's
+    interface; root_scores are per-mille win rates, not evaluator units.
+    """
+
+    def __init__(self, playouts: int = DEFAULT_PLAYOUTS, workers: int = DEFAULT_WORKERS, exploration: float = 1.4):
+        self.playouts = playouts
+        self.workers = max(1, workers)
+        self.exploration = exploration
+        self.last_stats: Dict = {}
+        # Set by stop() from another thread; shared with the pool workers, which check it between playouts.
+        self.stopped = multiprocessing.Event()
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.stopped,))
+            atexit.register(self.close)
+        return self._pool
+
+    def stop(self) -> None:
+        """Make a search() running on another thread (and its workers) return within a few playouts.
+
+        As with SearchEngine, the flag outlives the start of search().
+        """
+        self.stopped.set()
+
+    def resume(self) -> None:
+        """Clear a stop(); call before submitting a search that stop() may end."""
+        self.stopped.clear()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def search(self, board: BitBoard, player: str, time_budget: float, deadline: float | None = None) -> SearchResult:
+        start = time.perf_counter()
+        if deadline is not None:
+            time_budget = max(0.0, deadline - start)
+        seed = board.key & 0xFFFFFFFF
+        per_worker = max(1, self.playouts // self.workers)
+        # Leave headroom for pickling results back across the pool.
+        budget = time_budget * 0.9
+        if self.workers == 1:
+            results = [_run_tree(board.x, board.o, player, per_worker, budget, seed, self.exploration, self.stopped)]
+        else:
+            pool = self._get_pool()
+            futures = [pool.submit(_run_tree, board.x, board.o, player, per_worker, budget, seed + i, self.exploration)
+                       for i in range(self.workers)]
+            results = [f.result() for f in futures]
+
+        visits: Dict[Tuple[int, int], int] = {}
+        wins: Dict[Tuple[int, int], float] = {}
+        for result in results:
+            for move, (n, w) in result.items():
+                visits[move] = visits.get(move, 0) + n
+                wins[move] = wins.get(move, 0.0) + w
+        elapsed = time.perf_counter() - start
+        total = sum(visits.values())
+        self.last_stats = {
+            "playouts": total,
+            "playouts_per_sec": total / elapsed if elapsed > 0 else 0.0,
+            "workers": self.workers,
+            "elapsed": elapsed,
+            "visits": dict(sorted(visits.items(), key=lambda kv: -kv[1])),
+        }
+        if not visits:
+            legal = board.legal_moves()
+            return SearchResult(legal[0] if legal else None, 0, 0, 0, elapsed, {})
+        move = max(visits, key=lambda m: (visits[m], wins[m]))
+        # Per-mille win rate by the rule of succession, so a child seen once is not scored a certain win.
+        root_scores = {m: int(1000 * (wins[m] + 1) / (visits[m] + 2)) for m in visits}
+        return SearchResult(move, root_scores[move], 0, total, elapsed, root_scores)
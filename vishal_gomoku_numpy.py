@@ -0,0 +1,210 @@
+"""Optional NumPy backend: the threat scanner over a batch of boards.
+
+    python vishal_gomoku_numpy.py --check --positions 5000
+
+checks batch_threats() against the pure-Python find_threat_mask() on the
+bench corpus plus seeded random positions, and exits non-zero on any
+mismatch.
+"""
+import argparse
+import random
+import sys
+import time
+from typing import List, NamedTuple, Sequence
+from vishal_gomoku_bitboard import BitBoard, DIRECTIONS
+from vishal_gomoku_threats import WINDOWS4, WINDOWS5, find_threat_mask
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+except ImportError:  # NumPy is only needed for offline batch analysis
+    np = None
+
+EMPTY, X, O = 0, 1, 2
+
+
+class BatchThreats(NamedTuple):
+    win: "np.ndarray"           # (N, 2) uint64
+    block: "np.ndarray"
+    open_three: "np.ndarray"
+    broken_three: "np.ndarray"
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("vishal_gomoku_numpy needs NumPy (pip install numpy)")
+
+
+def _window_starts(windows) -> List[List[int]]:
+    """Start cells of the windows per direction, in the tables' order."""
+    starts: List[List[int]] = [[] for _ in DIRECTIONS]
+    steps = [dr * 8 + dc for dr, dc in DIRECTIONS]
+    for w in windows:
+        starts[steps.index(w[1] - w[0])].append(w[0])
+    return starts
+
+
+def _incidence(cell_lists) -> "np.ndarray":
+    m = np.zeros((len(cell_lists), 64), dtype=np.float32)
+    for w, cells in enumerate(cell_lists):
+        m[w, list(cells)] = 1
+    return m
+
+
+if np is not None:
+    _STEPS = [dr * 8 + dc for dr, dc in DIRECTIONS]
+    _STARTS5 = _window_starts(WINDOWS5)
+    _STARTS4 = _window_starts(WINDOWS4)
+    _CELLS5 = _incidence(WINDOWS5)
+    _CELLS4_ENDS = _incidence([(w[0], w[3]) for w in WINDOWS4])
+    _BITS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+
+def boards_to_array(boards: Sequence[BitBoard]) -> "np.ndarray":
+    """Stack BitBoards into an (N, 8, 8) int8 array."""
+    _require_numpy()
+    out = np.zeros((len(boards), 64), dtype=np.int8)
+    for n, board in enumerate(boards):
+        out[n] = (_unpack(board.x) * X) + (_unpack(board.o) * O)
+    return out.reshape(len(boards), 8, 8)
+
+
+def _unpack(mask: int) -> "np.ndarray":
+    return ((np.uint64(mask) & _BITS) != 0).astype(np.int8)
+
+
+def _windows(flat: "np.ndarray", length: int, starts: List[List[int]]) -> "np.ndarray":
+    """(N, windows, length) view of a (N, 64) array, one strided pass per direction.
+
+    Each direction reads every start cell i as i, i + step, ... through
+    as_strided on a zero-padded copy, then keeps the starts whose window stays
+    on the board. Concatenated, the windows come out in the table order.
+    """
+    n = flat.shape[0]
+    pad = 9 * (length - 1)
+    padded = np.zeros((n, 64 + pad), dtype=flat.dtype)
+    padded[:, :64] = flat
+    s_n, s_c = padded.strides
+    parts = []
+    for step, start in zip(_STEPS, starts):
+        view = as_strided(padded, shape=(n, 64, length), strides=(s_n, s_c, s_c * step), writeable=False)
+        parts.append(view[:, start])
+    return np.concatenate(parts, axis=1)
+
+
+def _to_masks(cells: "np.ndarray") -> "np.ndarray":
+    """(N, 64) bool -> (N,) uint64 bitboards."""
+    return np.packbits(cells, axis=1, bitorder="little").view("<u8")[:, 0]
+
+
+def _scan(own: "np.ndarray", other: "np.ndarray", empty: "np.ndarray"):
+    w5_own = _windows(own, 5, _STARTS5)
+    own5 = w5_own.sum(axis=2, dtype=np.int8)
+    opp5 = _windows(other, 5, _STARTS5).sum(axis=2, dtype=np.int8)
+    inner = w5_own[:, :, 1:4].sum(axis=2, dtype=np.int8) == 3
+
+    fours = (own5 == 4) & (opp5 == 0)
+    open3 = (own5 == 3) & (opp5 == 0)
+    closed3 = (own5 == 3) & (opp5 == 1)
+    own4 = _windows(own, 4, _STARTS4).sum(axis=2, dtype=np.int8)
+    opp4 = _windows(other, 4, _STARTS4).sum(axis=2, dtype=np.int8)
+    ends = ((own4 == 3) & (opp4 == 0)).astype(np.float32) @ _CELLS4_ENDS > 0
+
+    def cells(selected):
+        # Window-to-cell scatter as a 0/1 matrix product (exact in float32).
+        return (selected.astype(np.float32) @ _CELLS5 > 0) & empty
+
+    win = cells(fours)
+    strict = cells((open3 & inner) | closed3) | (ends & empty)
+    broken = cells(open3 | closed3) | (ends & empty)
+    return win, strict, broken
+
+
+def batch_threats(boards: "np.ndarray") -> BatchThreats:
+    """Win / must-block / open-three / broken-three masks for every board and player.
+
+    boards is an (N, 8, 8) array of EMPTY / X / O. Each field is an (N, 2)
+    uint64 array of bitboards (bit r * 8 + c), column 0 for X and 1 for O,
+    equal to the pure-Python scanner's masks:
+    - win:          find_threat_mask(board, player, 4)
+    - block:        find_threat_mask(board, opponent, 4)
+    - open_three:   find_threat_mask(board, player, 3, broken_threes=False)
+    - broken_three: find_threat_mask(board, player, 3, broken_threes=True)
+    """
+    _require_numpy()
+    flat = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    xs = (flat == X).astype(np.int8)
+    os_ = (flat == O).astype(np.int8)
+    empty = flat == EMPTY
+    n = flat.shape[0]
+    win = np.zeros((n, 2), dtype=np.uint64)
+    open_three = np.zeros((n, 2), dtype=np.uint64)
+    broken_three = np.zeros((n, 2), dtype=np.uint64)
+    for p, (own, other) in enumerate(((xs, os_), (os_, xs))):
+        w, strict, broken = _scan(own, other, empty)
+        win[:, p] = _to_masks(w)
+        open_three[:, p] = _to_masks(strict)
+        broken_three[:, p] = _to_masks(broken)
+    return BatchThreats(win, win[:, ::-1].copy(), open_three, broken_three)
+
+
+def parity_corpus(positions: int, seed: int = 0) -> List[BitBoard]:
+    """The bench corpus plus `positions` seeded random positions of every stone count."""
+    from vishal_gomoku_bench import _random_position, build_corpus
+    rng = random.Random(seed)
+    boards = [board for _, board, _ in build_corpus()]
+    boards += [_random_position(rng, rng.randrange(0, 61))[0] for _ in range(positions)]
+    return boards
+
+
+def check_parity(boards: Sequence[BitBoard]) -> List[str]:
+    """Mismatches between batch_threats() and find_threat_mask() on boards, one line each."""
+    result = batch_threats(boards_to_array(boards))
+    mismatches = []
+    for n, board in enumerate(boards):
+        for p, (player, opp) in enumerate((('X', 'O'), ('O', 'X'))):
+            expected = {
+                "win": find_threat_mask(board, player, 4),
+                "block": find_threat_mask(board, opp, 4),
+                "open_three": find_threat_mask(board, player, 3, broken_threes=False),
+                "broken_three": find_threat_mask(board, player, 3, broken_threes=True),
+            }
+            for field, mask in expected.items():
+                got = int(getattr(result, field)[n, p])
+                if got != mask:
+                    mismatches.append(f"board {n} {player} {field}: numpy {got:#018x} != python {mask:#018x}")
+    return mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NumPy batch threat scanner")
+    parser.add_argument("--check", action="store_true",
+                        help="compare with find_threat_mask() and exit 1 on a mismatch")
+    parser.add_argument("--positions", type=int, default=5000, help="random positions on top of the bench corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    _require_numpy()
+    boards = parity_corpus(args.positions, args.seed)
+    start = time.perf_counter()
+    batch_threats(boards_to_array(boards))
+    batch = time.perf_counter() - start
+    start = time.perf_counter()
+    for board in boards:
+        for player in ('X', 'O'):
+            find_threat_mask(board, player, 4)
+            find_threat_mask(board, player, 3, broken_threes=False)
+            find_threat_mask(board, player, 3, broken_threes=True)
+    scalar = time.perf_counter() - start
+    print(f"{len(boards)} boards: numpy {batch * 1000:.1f} ms, pure Python {scalar * 1000:.1f} ms")
+    if args.check:
+        mismatches = check_parity(boards)
+        for line in mismatches[:20]:
+            print(line)
+        print(f"parity: {len(mismatches)} mismatches over {len(boards)} boards x 2 players x 4 masks")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""The move pipeline shared by every agent variant.
+
+Each agent keeps its own prompts, strategic cascade and fallback; the
+mixin runs the steps between them: ponder, forced line, LLM/engine race,
+LLM gate, engine search, the agent's strategic move and the veto-screened
+LLM, plus the LLM request itself (persistent cache, rank mode, compact or
+annotated prompts, hedging).
+
+An agent lists the mixin before gomoku.Agent, calls _setup_pipeline() from
+_setup() once self.system_prompt is set, and provides:
+
+- user_prompt_template, llm_params and llm_temperature: its full prompt,
+  filled in with me, opp, move, board and legal_moves;
+- _choose_move(game_state, deadline): its own checks and board parsing,
+  then _pipeline_move(), then its fallback when that returns None.
+
+Optional hooks are _get_strategic_move() (no strategic stage by default)
+and _complete_llm() (one call, JSON between the answer's outer braces).
+Whatever runs the games awaits end_game() once a game is over.
+"""
+import json
+import time
+from typing import Any, Dict, List, Tuple
+from gomoku.llm import OpenAIGomokuClient
+from vishal_gomoku_bitboard import BitBoard
+from vishal_gomoku_gate import LLMGate
+from vishal_gomoku_hedge import LLMHedger
+from vishal_gomoku_llm import DEFAULT_LLM_STREAM, make_llm_client, move_first
+from vishal_gomoku_llm_cache import LLMMoveCache, prompt_version
+from vishal_gomoku_ponder import Ponderer
+from vishal_gomoku_prompt import DEFAULT_PROMPT_CANDIDATES, DEFAULT_PROMPT_MODE, SYSTEM_PROMPTS, ask_compact
+from vishal_gomoku_race import DEFAULT_RACE_DEADLINE, race_llm
+from vishal_gomoku_rank import DEFAULT_LLM_RANK, DEFAULT_RANK_CANDIDATES, RANK_SYSTEM_PROMPT, rank_moves
+from vishal_gomoku_search import DEFAULT_SEARCH_TIME, make_engine
+from vishal_gomoku_trace import NULL_TRACE, start_trace
+from vishal_gomoku_tt import TranspositionTable
+from vishal_gomoku_vcf import ThreatSpaceSolver
+from vishal_gomoku_veto import LLMVeto
+
+LLM_MODEL = "google/gemma-2-9b-it"
+
+
+class MovePipelineMixin:
+    """Ponder, forced, race, gate, search, strategic and LLM stages for a gomoku.Agent."""
+
+    user_prompt_template = ""
+    llm_params: Dict[str, Any] = {"max_tokens": 150}
+    llm_temperature = 0.0
+
+    def _setup_pipeline(self, tt: TranspositionTable | None = None) -> None:
+        """LLM client, move cache, engine and the pipeline's stages."""
+        if DEFAULT_LLM_STREAM:
+            # A streamed answer is cut off once its move is decoded, so ask for the move first
+            self.system_prompt = move_first(self.system_prompt)
+
+        self.llm = make_llm_client(OpenAIGomokuClient, LLM_MODEL, logprobs=DEFAULT_LLM_RANK)
+        self.prompt_mode = DEFAULT_PROMPT_MODE
+        self.llm_rank = DEFAULT_LLM_RANK
+        # Cached moves are only valid for the prompt that produced them: hash every piece of it.
+        if self.llm_rank:
+            prompt = (RANK_SYSTEM_PROMPT, str(DEFAULT_RANK_CANDIDATES))
+        elif self.prompt_mode == "annotated":
+            prompt = (SYSTEM_PROMPTS["annotated"], str(DEFAULT_PROMPT_CANDIDATES))
+        elif self.prompt_mode in SYSTEM_PROMPTS:
+            prompt = (SYSTEM_PROMPTS[self.prompt_mode],)
+        else:
+            prompt = (self.system_prompt, self.user_prompt_template)
+        self.llm_cache = LLMMoveCache(LLM_MODEL, prompt_version(type(self).__name__, *prompt))
+        self.search_time = DEFAULT_SEARCH_TIME
+        self.race_deadline = DEFAULT_RACE_DEADLINE
+        self.solver = ThreatSpaceSolver()
+        self.trace = NULL_TRACE
+        self.engine = make_engine(tt)
+        # Prefetching an LLM answer is only worth its tokens when the cache is there to keep it.
+        self.ponderer = Ponderer(getattr(self.engine, "tt", None), self._ask_llm if self.llm_cache.path else None)
+        self.hedger = LLMHedger()
+        self.gate = LLMGate()
+        self.veto = LLMVeto()
+
+    async def get_move(self, game_state: Any) -> Tuple[int, int]:
+        """Return the next move; with VISHAL_GOMOKU_TRACE set, also log its per-phase timings."""
+        self.trace = start_trace(type(self).__name__)
+        try:
+            # One clock for the whole move: the race gets whatever the earlier steps leave.
+            deadline = time.perf_counter() + self.race_deadline
+            move = await self._choose_move(game_state, deadline)
+            self.trace.emit(move)
+            if self.ponderer.enabled:
+                # Engine answers are only worth pondering when the engine is what picks our moves.
+                self.ponderer.start(game_state.format_board(formatter="standard"), game_state.current_player.value,
+                                    move, answer=self.search_time > 0 and self.race_deadline <= 0)
+            return move
+        finally:
+            self.trace = NULL_TRACE
+
+    async def end_game(self) -> None:
+        """Call when the game is over: stops pondering its positions."""
+        await self.ponderer.stop()
+
+    async def _choose_move(self, game_state: Any, deadline: float) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def _get_strategic_move(self, board: BitBoard, me: str, opp: str,
+                            legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+        """The agent's rule-based move between engine search and the LLM; none by default."""
+        return None
+
+    async def _pipeline_move(self, board: BitBoard, board_str: str, me: str, opp: str,
+                             legal_moves: List[Tuple[int, int]], deadline: float) -> Tuple[int, int] | None:
+        """The first legal move from the stages after the agent's own checks, else None."""
+        # PONDER: answer worked out during the opponent's turn
+        pondered = await self.ponderer.take(board, me)
+        self.trace.lap("ponder")
+        if pondered in legal_moves:
+            print(f"PONDERED MOVE: {pondered}")
+            self.trace.note(source="ponder")
+            return pondered
+
+        # FORCED: threat-space search (VCF/VCT) for either side before search or LLM
+        forced = self.solver.forced_move(board, me)
+        self.trace.lap("forced")
+        if forced and forced.move in legal_moves:
+            print(f"FORCED MOVE: {forced.move} ({forced.kind}, line {forced.line})")
+            self.trace.note(source="forced")
+            return forced.move
+
+        # RACE: LLM and engine side by side under one per-move deadline
+        if self.race_deadline > 0:
+            raced = await race_llm(self.engine, board, me, self._screened_llm(board, board_str, me, opp, legal_moves),
+                                   legal_moves, deadline)
+            self.trace.lap("race")
+            if raced.move in legal_moves:
+                print(f"RACE MOVE: {raced.move} ({raced.source}, {raced.elapsed:.2f}s)")
+                self.trace.note(source="race-" + raced.source)
+                return raced.move
+
+        # Gate: the LLM only for positions the evaluator finds unclear, else its best move
+        if self.gate.enabled:
+            decision = self.gate.decide(self.engine, board, me, self.search_time)
+            self.trace.lap("gate")
+            self.trace.note(gate=decision.reason, gate_margin=decision.margin)
+            if decision.consult:
+                try:
+                    move = await self._screened_llm(board, board_str, me, opp, legal_moves)
+                    if move in legal_moves:
+                        return move
+                except Exception as e:
+                    self.trace.note(error=type(e).__name__)
+            if decision.move in legal_moves:
+                self.trace.note(source="gate")
+                return decision.move
+
+        # SEARCH: iterative-deepening search under a hard per-move deadline
+        if self.search_time > 0:
+            result = self.engine.search(board, me, self.search_time)
+            self.trace.lap("search")
+            if result.move in legal_moves:
+                print(f"SEARCH MOVE: {result.move} (depth {result.depth}, {result.nodes} nodes)")
+                self.trace.note(source="search")
+                return result.move
+
+        # STRATEGIC: the agent's own rule-based cascade
+        strategic = self._get_strategic_move(board, me, opp, legal_moves)
+        self.trace.lap("strategic")
+        if strategic in legal_moves:
+            print(f"STRATEGIC MOVE: {strategic}")
+            self.trace.note(source="strategic")
+            return strategic
+
+        # LLM: persistent cache first, then the model
+        move = await self._screened_llm(board, board_str, me, opp, legal_moves)
+        return move if move in legal_moves else None
+
+    def _screened_llm(self, board: BitBoard, board_str: str, me: str, opp: str,
+                      legal_moves: List[Tuple[int, int]]):
+        """_ask_llm behind the veto, as an awaitable the race can start or drop."""
+        return self.veto.screen(self._ask_llm(board, board_str, me, opp, legal_moves), board, me, self.trace)
+
+    async def _ask_llm(self, board: BitBoard, board_str: str, me: str, opp: str,
+                       legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+        """The LLM's move for this position if it is legal, from the persistent cache when possible."""
+        # Persistent LLM cache: a repeated position skips the network round trip
+        cached = self.llm_cache.get(board, me)
+        self.trace.lap("llm_cache")
+        if cached in legal_moves:
+            print(f"CACHED LLM MOVE: {cached}")
+            self.trace.note(source="llm_cache")
+            return cached
+
+        if self.llm_rank:
+            # One call ranking the tactical candidates: nothing to parse, nothing illegal to retry
+            ranking = await rank_moves(self.llm, board, me, legal_moves, self.trace, temperature=0.0)
+            if ranking.source in ("logprobs", "choice"):
+                self.llm_cache.put(board, me, ranking.best)
+            self.trace.note(source="llm" if ranking.source in ("logprobs", "choice") else "rank-" + ranking.source)
+            return ranking.best
+
+        if self.prompt_mode in SYSTEM_PROMPTS:
+            # Labelled row strings (plus the tagged engine candidates when annotated) instead of the full prompt
+            move = await ask_compact(self.llm, board, me, legal_moves, self.hedger, self.trace,
+                                     annotate=self.prompt_mode == "annotated", temperature=self.llm_temperature)
+        else:
+            user_prompt = self.user_prompt_template.format(me=me, opp=opp, move=board.stone_count() + 1,
+                                                           board=board_str, legal_moves=legal_moves)
+            messages = [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
+            params = dict(self.llm_params, temperature=self.llm_temperature)
+            self.trace.lap("prompt")
+            self.trace.note(llm_consulted=True)
+            if self.hedger.enabled:
+                # Hedged or voted requests in place of the agent's own call
+                outcome = await self.hedger.move(self.llm.complete, messages, params, legal_moves, board, me)
+                self.trace.lap("llm")
+                self.trace.note(retries=outcome.requests - 1)
+                move = outcome.move
+            else:
+                move = await self._complete_llm(messages, params, legal_moves)
+
+        if move is not None:
+            self.llm_cache.put(board, me, move)
+            self.trace.note(source="llm")
+        return move
+
+    async def _complete_llm(self, messages: List[Dict[str, str]], params: Dict[str, Any],
+                            legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+        """One request; its move from the JSON between the outer braces if that move is legal."""
+        response = await self.llm.complete(messages=messages, **params)
+        self.trace.lap("llm")
+        if "{" not in response or "}" not in response:
+            return None
+        data = json.loads(response[response.index("{"):response.rindex("}") + 1])
+        r, c = int(data["row"]), int(data["col"])
+        self.trace.lap("json_parse")
+        if (r, c) not in legal_moves:
+            return None
+        print(f"LLM move: ({r},{c}) - {data.get('reasoning', 'No reasoning')}")
+        return r, c
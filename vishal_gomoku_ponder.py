@@ -0,0 +1,173 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from vishal_gomoku_bitboard import BitBoard, bit_cells
+from vishal_gomoku_search import DEFAULT_SEARCH_TIME, SearchEngine
+from vishal_gomoku_tt import TranspositionTable
+from vishal_gomoku_vcf import ThreatSpaceSolver
+
+# Opponent replies pondered after each of our moves; 0 (the default) turns pondering off.
+DEFAULT_PONDER_REPLIES = int(os.environ.get("VISHAL_GOMOKU_PONDER_REPLIES", "0"))
+# Engine time spent on each pondered position, in seconds.
+DEFAULT_PONDER_TIME = float(os.environ.get("VISHAL_GOMOKU_PONDER_TIME", str(DEFAULT_SEARCH_TIME)))
+# Also ask the LLM about each predicted reply, so its answer is in the LLM cache (costs tokens).
+DEFAULT_PONDER_LLM = os.environ.get("VISHAL_GOMOKU_PONDER_LLM", "0") == "1"
+# Cap on the reply table, in positions.
+DEFAULT_PONDER_ENTRIES = 64
+# Transposition table for pondering when the agent's engine has none of its own.
+PONDER_TT_BYTES = 4 << 20
+
+Prefetch = Callable[[BitBoard, str, str, str, List[Tuple[int, int]]], Awaitable[Any]]
+
+
+class Ponderer:
+    """Precomputes our answers to the opponent's likely replies while they think.
+
+    start() is called with the board after our move and launches a
+    background task on the running event loop. It predicts up to `replies`
+    opponent moves (forced blocks first, then the engine's best root moves)
+    and, for each, stores the forced-line or engine answer in a small reply
+    table and optionally prefetches the LLM's answer. The CPU work runs in
+    the loop's default executor, at most `think_time` per position. take()
+    cancels whatever is still running, waits for the worker thread to stop,
+    and returns the stored answer if the real position was pondered. At
+    game end, stop() does the same without a position, so no pondering of
+    the old game runs on into the next.
+    """
+
+    def __init__(self, tt: TranspositionTable | None = None, prefetch: Prefetch | None = None,
+                 replies: int = DEFAULT_PONDER_REPLIES, think_time: float = DEFAULT_PONDER_TIME,
+                 prefetch_llm: bool = DEFAULT_PONDER_LLM, max_entries: int = DEFAULT_PONDER_ENTRIES):
+        self.replies = replies
+        self.think_time = think_time
+        self.prefetch = prefetch if prefetch_llm else None
+        self.max_entries = max_entries
+        self.engine = SearchEngine(tt=tt if tt is not None else TranspositionTable(PONDER_TT_BYTES))
+        self.solver = ThreatSpaceSolver(time_budget=min(0.15, think_time))
+        self.table: "OrderedDict[Tuple[int, int, str], Tuple[int, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.pondered = 0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.replies > 0
+
+    def start(self, board_str: str, me: str, move: Tuple[int, int], answer: bool = True) -> None:
+        """Ponder the position after our `move` on board_str, with the opponent to move.
+
+        With answer=False only the LLM prefetch runs - for agents whose
+        moves come from the LLM rather than the engine.
+        """
+        previous = self.cancel()
+        if not self.enabled:
+            return
+        board = BitBoard.from_string(board_str)
+        if not board.is_empty(*move):
+            return
+        board.place(move[0], move[1], me)
+        if board.has_five(me) or not board.empty_mask():
+            return  # game over: nothing to ponder
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._ponder(board, me, answer, previous))
+        except RuntimeError:
+            self._task = None  # no running loop
+
+    def cancel(self) -> "asyncio.Task | None":
+        """Cancel pondering and empty the reply table; returns the task if it was still running.
+
+        The engine and solver are stopped here too, so the worker thread
+        quits even if the task's loop never runs again.
+        """
+        task, self._task = self._task, None
+        self.table.clear()
+        if task is None or task.done():
+            return None
+        task.cancel()
+        self.engine.stop()
+        self.solver.stop()
+        return task
+
+    async def stop(self) -> None:
+        """Game over: cancel pondering and wait for its worker thread to finish."""
+        await self._join(self.cancel())
+
+    async def take(self, board: BitBoard, me: str) -> Tuple[int, int] | None:
+        """Our pondered answer for this exact position, once background work has stopped."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            await self._join(task)
+        if not self.enabled:
+            return None
+        move = self.table.get((board.x, board.o, me))
+        if move is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return move
+
+    @staticmethod
+    async def _join(task: "asyncio.Task | None") -> None:
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            await asyncio.wait({task})
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "pondered": self.pondered, "entries": len(self.table)}
+
+    async def _ponder(self, board: BitBoard, me: str, answer: bool, previous: "asyncio.Task | None") -> None:
+        # The cancelled ponder shares our engine and solver: let its thread stop before resuming them.
+        await self._join(previous)
+        opp = 'O' if me == 'X' else 'X'
+        for r, c in await self._in_executor(self._predict, board, opp):
+            child = board.copy()
+            child.place(r, c, opp)
+            if child.has_five(opp) or not child.empty_mask():
+                continue
+            if answer:
+                move = await self._in_executor(self._answer, child, me)
+                if move is not None:
+                    self.table[(child.x, child.o, me)] = move
+                    while len(self.table) > self.max_entries:
+                        self.table.popitem(last=False)
+                    self.pondered += 1
+            if self.prefetch is not None:
+                try:
+                    await self.prefetch(child, child.to_standard(), me, opp, child.legal_moves())
+                except Exception:
+                    pass  # a failed prefetch only costs the cache entry
+
+    async def _in_executor(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Clear the last cancel's stop before submitting, so a stop issued before the thread starts still counts.
+        self.engine.resume()
+        self.solver.resume()
+        future = asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The engine and solver are reused by the next ponder: stop the thread before giving up.
+            self.engine.stop()
+            self.solver.stop()
+            await asyncio.wait({future})
+            raise
+
+    def _predict(self, board: BitBoard, opp: str) -> List[Tuple[int, int]]:
+        """The opponent's likely replies: forced blocks of our fours, else the engine's top root moves."""
+        me = 'O' if opp == 'X' else 'X'
+        blocks = bit_cells(board.winning_cells(me))
+        if blocks:
+            return blocks[:self.replies]
+        result = self.engine.search(board, opp, self.think_time)
+        ranked = sorted(result.root_scores, key=lambda m: -result.root_scores[m])
+        if not ranked and result.move is not None:
+            ranked = [result.move]
+        return ranked[:self.replies]
+
+    def _answer(self, board: BitBoard, me: str) -> Tuple[int, int] | None:
+        """What get_move would play: the forced-line move, else the engine's."""
+        forced = self.solver.forced_move(board, me)
+        if forced is not None:
+            return forced.move
+        return self.engine.search(board, me, self.think_time).move
@@ -0,0 +1,293 @@
+"""Compact prompt encoding for the agents' LLM calls.
+
+The full prompts print the board with a column header and list every
+legal move as a Python tuple, which is up to 64 "(r, c)" entries, and
+repeat long instruction blocks in every user message. Compact mode
+(VISHAL_GOMOKU_PROMPT=compact) sends one fixed system prompt, identical
+for every agent and every move so server-side prefix caching can reuse
+it, and a user message that is only the side to move and eight labelled
+row strings. Cells are named A1-H8 (column letter, row number), every
+empty cell is legal, and the reply is {"move": "D4"}.
+
+Annotated mode (VISHAL_GOMOKU_PROMPT=annotated) adds what the threat
+scanner already knows: the top `VISHAL_GOMOKU_PROMPT_CANDIDATES` moves,
+each tagged with the threats it makes or blocks, e.g.
+"D4: blocks O open three (diagonal); makes X four". The model only picks
+one of those labels instead of scanning every line itself, and a reply
+naming anything else counts as no answer.
+
+    python vishal_gomoku_prompt.py --latency 0.3 --prefill-ms 0.5
+
+prints estimated input and output tokens, legal answers and LLM latency
+per move for each agent variant in every mode against the in-process
+stand-in LLM.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import re
+import time
+from typing import Any, Dict, List, Tuple
+from vishal_gomoku_bitboard import BitBoard, cell_bit
+from vishal_gomoku_threats import ThreatState, score_moves
+from vishal_gomoku_trace import NULL_TRACE
+
+# Prompt encoding for the agents' LLM calls: "full" (each agent's own prompt), "compact" or "annotated".
+DEFAULT_PROMPT_MODE = os.environ.get("VISHAL_GOMOKU_PROMPT", "full")
+# Tagged candidate moves listed in an annotated prompt.
+DEFAULT_PROMPT_CANDIDATES = int(os.environ.get("VISHAL_GOMOKU_PROMPT_CANDIDATES", "5"))
+# A compact reply is one short JSON object.
+COMPACT_MAX_TOKENS = 16
+
+COLUMNS = "ABCDEFGH"
+
+COMPACT_SYSTEM_PROMPT = """
+You play Gomoku on an 8x8 board. Five stones in a row (across, down or diagonal) wins.
+Columns are A-H left to right, rows 1-8 top to bottom; cells are named like D4.
+The board is given as 8 row strings: X and O are stones, '.' is empty. Every empty cell is legal.
+Choose in this order: 1) win now; 2) block the opponent's five; 3) make a four or block an open three;
+4) build open threes near your stones, preferring the centre.
+Reply with JSON only: {"move": "D4"}
+""".strip()
+
+ANNOTATED_SYSTEM_PROMPT = """
+You play Gomoku on an 8x8 board. Five stones in a row (across, down or diagonal) wins.
+Columns are A-H left to right, rows 1-8 top to bottom; cells are named like D4.
+The board is given as 8 row strings: X and O are stones, '.' is empty.
+An engine lists the candidate moves, best first by its count, with the threats each one makes or blocks.
+Pick one of the listed cells. Reply with JSON only: {"move": "D4"}
+""".strip()
+
+# System prompt per encoding that replaces the agent's own.
+SYSTEM_PROMPTS = {"compact": COMPACT_SYSTEM_PROMPT, "annotated": ANNOTATED_SYSTEM_PROMPT}
+
+# Names for DIRECTIONS in order, as used in the tags.
+DIRECTION_NAMES = ("across", "down", "diagonal", "anti-diagonal")
+
+_LABEL = re.compile(r"^\s*([A-Ha-h])\s*([1-8])\s*$")
+# Rough token split: words, single digits and single punctuation marks.
+_TOKEN = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+
+def cell_label(row: int, col: int) -> str:
+    return f"{COLUMNS[col]}{row + 1}"
+
+
+def parse_label(text: str) -> Tuple[int, int] | None:
+    m = _LABEL.match(text)
+    if not m:
+        return None
+    return int(m.group(2)) - 1, COLUMNS.index(m.group(1).upper())
+
+
+def compact_board(board: BitBoard) -> str:
+    """Column header plus one "<row number> <8 cells>" line per row."""
+    return "\n".join(["  " + COLUMNS] + [f"{r + 1} {''.join(row)}" for r, row in enumerate(board.to_rows())])
+
+
+def compact_messages(board: BitBoard, player: str) -> List[Dict[str, str]]:
+    """Chat messages for the compact encoding: the fixed system prompt, then the position."""
+    return [
+        {"role": "system", "content": COMPACT_SYSTEM_PROMPT},
+        {"role": "user", "content": f"You: {player}\n{compact_board(board)}"},
+    ]
+
+
+def candidates(board: BitBoard, player: str, legal_moves: List[Tuple[int, int]],
+               k: int = DEFAULT_PROMPT_CANDIDATES) -> List[Tuple[int, int]]:
+    """Up to k legal moves, best first: a win, else the forced blocks, else the strongest safe attack or defence."""
+    opp = 'O' if player == 'X' else 'X'
+    wins, threats = board.winning_cells(player), board.winning_cells(opp)
+    win = [m for m in legal_moves if wins & cell_bit(*m)]
+    if win:
+        return win[:1]
+    blocks = [m for m in legal_moves if threats & cell_bit(*m)]
+    if blocks:
+        return blocks[:k]
+    attack, defence = score_moves(board, player), score_moves(board, opp)
+    safe = [m for m in legal_moves if not attack.gives_five & cell_bit(*m)] or list(legal_moves)
+    safe.sort(key=lambda m: (-max(attack.value(*m), defence.value(*m)), attack.center[m[0] * 8 + m[1]]))
+    return safe[:k]
+
+
+def _longest(board: BitBoard, r: int, c: int, player: str) -> Tuple[int, str]:
+    """Longest run through (r, c) counting it as player's, and its direction name."""
+    lengths = board.run_lengths(r, c, player)
+    best = max(range(len(lengths)), key=lengths.__getitem__)
+    return lengths[best], DIRECTION_NAMES[best]
+
+
+def move_tags(board: BitBoard, player: str, move: Tuple[int, int]) -> List[str]:
+    """Short threat tags for player's stone on move, strongest first, e.g. ["blocks O open three (down)"]."""
+    opp = 'O' if player == 'X' else 'X'
+    r, c = move
+    bit = cell_bit(r, c)
+    if board.winning_cells(player) & bit:
+        return ["wins"]
+    state = ThreatState(board.copy())
+    tags = []
+    if state.winning_cells(opp) & bit:
+        tags.append(f"blocks {opp} five")
+    if state.three_cells(opp, open_only=True) & bit:
+        tags.append(f"blocks {opp} open three ({_longest(board, r, c, opp)[1]})")
+    elif state.three_cells(opp) & bit:
+        tags.append(f"blocks {opp} three ({_longest(board, r, c, opp)[1]})")
+    fours, opens = state.winning_cells(player), state.three_cells(player, open_only=True)
+    state.place(r, c, player)
+    new_fours = (state.winning_cells(player) & ~fours).bit_count()
+    new_opens = state.three_cells(player, open_only=True) & ~opens
+    if new_fours >= 2:
+        tags.append(f"makes {player} open four")
+    elif new_fours:
+        tags.append(f"makes {player} four")
+    if new_opens:
+        tags.append(f"makes {player} open three ({_longest(board, r, c, player)[1]})")
+    if not tags:
+        length, direction = _longest(board, r, c, player)
+        tags.append(f"extends {player} to {length} ({direction})" if length > 1 else "develops")
+    return tags
+
+
+def annotated_messages(board: BitBoard, player: str, options: List[Tuple[int, int]]) -> List[Dict[str, str]]:
+    """Chat messages for the annotated encoding: the fixed system prompt, the position and the tagged candidates."""
+    listing = "\n".join(f"{cell_label(*m)}: {'; '.join(move_tags(board, player, m))}" for m in options)
+    return [
+        {"role": "system", "content": ANNOTATED_SYSTEM_PROMPT},
+        {"role": "user", "content": f"You: {player}\n{compact_board(board)}\nCandidates:\n{listing}"},
+    ]
+
+
+def parse_move(text: str) -> Tuple[int, int] | None:
+    """(row, col) from the JSON object in an LLM answer, {"move": "D4"} or {"row": r, "col": c}."""
+    if "{" not in text or "}" not in text:
+        return None
+    try:
+        data = json.loads(text[text.index("{"):text.rindex("}") + 1])
+        if isinstance(data.get("move"), str):
+            return parse_label(data["move"])
+        return int(data["row"]), int(data["col"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count; consistent across prompts, which is all the comparisons need."""
+    return len(_TOKEN.findall(text))
+
+
+def message_tokens(messages: List[Dict[str, Any]]) -> Dict[str, int]:
+    counts = {"system": 0, "user": 0}
+    for m in messages:
+        role = "system" if m.get("role") == "system" else "user"
+        counts[role] += estimate_tokens(str(m.get("content", "")))
+    return counts
+
+
+async def ask_compact(llm: Any, board: BitBoard, player: str, legal_moves: List[Tuple[int, int]],
+                      hedger: Any = None, trace: Any = NULL_TRACE, annotate: bool = False,
+                      **params: Any) -> Tuple[int, int] | None:
+    """The LLM's legal move for this position under the compact encoding, or None.
+
+    With annotate the prompt lists the tagged candidates and only those
+    count as legal; a single candidate is returned without a call. params
+    go to llm.complete() as they would for the full prompt; with an
+    enabled hedger the requests are hedged or voted as in the full path.
+    """
+    if annotate:
+        legal_moves = candidates(board, player, legal_moves)
+        if len(legal_moves) <= 1:
+            return legal_moves[0] if legal_moves else None
+        messages = annotated_messages(board, player, legal_moves)
+    else:
+        messages = compact_messages(board, player)
+    params.setdefault("max_tokens", COMPACT_MAX_TOKENS)
+    trace.lap("prompt")
+    trace.note(llm_consulted=True)
+    if hedger is not None and hedger.enabled:
+        outcome = await hedger.move(llm.complete, messages, params, legal_moves, board, player)
+        trace.lap("llm")
+        trace.note(retries=outcome.requests - 1)
+        return outcome.move
+    response = await llm.complete(messages=messages, **params)
+    trace.lap("llm")
+    move = parse_move(response)
+    trace.lap("json_parse")
+    return move if move in legal_moves else None
+
+
+class _Recorder:
+    """Wraps an LLM client and keeps the messages of the last request."""
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.messages: List[Dict[str, Any]] = []
+
+    async def complete(self, messages: List[Dict[str, Any]], **kwargs: Any) -> str:
+        self.messages = messages
+        return await self.client.complete(messages=messages, **kwargs)
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+async def _measure(agent: Any, boards: List[Tuple[BitBoard, str]]) -> Dict[str, Any]:
+    system, user, latencies, legal = [], [], [], 0
+    for board, player in boards:
+        opp = 'O' if player == 'X' else 'X'
+        agent.llm.messages = []
+        start = time.perf_counter()
+        move = await agent._ask_llm(board, board.to_standard(), player, opp, board.legal_moves())
+        latencies.append(time.perf_counter() - start)
+        tokens = message_tokens(agent.llm.messages)
+        system.append(tokens["system"])
+        user.append(tokens["user"])
+        legal += move is not None
+    return {"system": sum(system) / len(system), "user": sum(user) / len(user), "legal": legal / len(boards),
+            "p50_ms": _percentile(latencies, 50) * 1000, "p95_ms": _percentile(latencies, 95) * 1000}
+
+
+def main() -> None:
+    from vishal_gomoku_bench import AGENTS, _make_agent, build_corpus
+    from vishal_gomoku_llm_server import StandInClient, StandInConfig
+
+    parser = argparse.ArgumentParser(description="Prompt tokens and LLM latency per move for each prompt encoding")
+    parser.add_argument("--agents", nargs="*", help=f"subset of {[a[0] for a in AGENTS]}")
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed stand-in latency per request, seconds")
+    parser.add_argument("--prefill-ms", type=float, default=0.5,
+                        help="stand-in cost per uncached prompt token, milliseconds")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="charge repeated system prompts too")
+    parser.add_argument("--decode-ms", type=float, default=10.0, help="stand-in cost per output token, milliseconds")
+    parser.add_argument("--reasoning-words", type=int, default=20,
+                        help="length of the stand-in's reasoning field when a prompt asks for one")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    boards = [(board, player) for _, board, player in build_corpus() if board.empty_mask()]
+    print(f"{'agent':8} {'mode':9} {'system tok':>10} {'user tok':>9} {'out tok':>8} {'legal':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for name, module, cls in AGENTS:
+        if args.agents and name not in args.agents:
+            continue
+        for mode in ("full", *SYSTEM_PROMPTS):
+            config = StandInConfig("random", args.latency, malformed_rate=args.malformed_rate, seed=args.seed,
+                                   prefill_per_token=args.prefill_ms / 1000, prefix_cache=not args.no_prefix_cache,
+                                   decode_per_token=args.decode_ms / 1000, reasoning_words=args.reasoning_words)
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = _make_agent(module, cls, 0.0)
+                agent.llm = _Recorder(StandInClient(config))
+                agent.prompt_mode = mode
+                r = asyncio.run(_measure(agent, boards))
+            out = config.stats["decoded_tokens"] / max(1, config.stats["requests"])
+            print(f"{name:8} {mode:9} {r['system']:10.0f} {r['user']:9.0f} {out:8.1f} {r['legal']:6.0%} "
+                  f"{r['p50_ms']:8.0f} {r['p95_ms']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, List, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard
+from vishal_gomoku_search import SearchResult
+
+# Per-move deadline, in seconds, for racing the LLM against the engine; 0
+# keeps the sequential forced -> search -> strategic -> LLM order.
+DEFAULT_RACE_DEADLINE = float(os.environ.get("VISHAL_GOMOKU_RACE_DEADLINE", "0"))
+# Time kept back from the engine so its move is committed before the deadline.
+RACE_MARGIN = 0.02
+
+
+class RaceResult(NamedTuple):
+    move: Tuple[int, int] | None
+    source: str  # "llm" or "engine"
+    elapsed: float
+    engine: SearchResult | None
+
+
+async def race_llm(engine: Any, board: BitBoard, player: str, ask_llm: Awaitable[Tuple[int, int] | None],
+                   legal_moves: List[Tuple[int, int]], deadline: float) -> RaceResult:
+    """Run ask_llm and engine.search side by side; one of their moves by `deadline` (perf_counter).
+
+    The engine searches in the loop's default executor so the LLM request
+    keeps being served. A legal LLM move that lands in time wins and the
+    engine is told to stop; otherwise the engine's best-so-far move is
+    committed and the LLM request cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    engine_end = deadline - min(RACE_MARGIN, max(0.0, deadline - start) / 10)
+    # Clear any earlier stop before submitting, so one issued before the thread starts still counts.
+    resume, stop = getattr(engine, "resume", None), getattr(engine, "stop", None)
+    if resume is not None:
+        resume()
+    searching = loop.run_in_executor(None, lambda: engine.search(board, player, engine_end - start, deadline=engine_end))
+    asking = asyncio.ensure_future(ask_llm)
+    try:
+        done, _ = await asyncio.wait({asking}, timeout=max(0.0, engine_end - time.perf_counter()))
+        if asking in done and not asking.cancelled() and asking.exception() is None:
+            move = asking.result()
+            if move in legal_moves:
+                if stop is not None:
+                    stop()
+                return RaceResult(move, "llm", time.perf_counter() - start, None)
+        result = await searching
+        return RaceResult(result.move, "engine", time.perf_counter() - start, result)
+    finally:
+        asking.cancel()
+        # The engine is reused next move, so never leave its search running or stopped.
+        await asyncio.shield(searching)
+        if resume is not None:
+            resume()
@@ -0,0 +1,161 @@
+"""One-call LLM move ranking over a short tactical candidate list.
+
+Instead of asking for a free-text move and retrying when it is illegal or
+unparsable, rank mode (VISHAL_GOMOKU_LLM_RANK=1) numbers up to
+`VISHAL_GOMOKU_LLM_RANK_CANDIDATES` moves picked by the threat scanner
+and asks the model once for the number of the best one. With a client
+that exposes top_logprobs() the answer token's log-probabilities give a
+distribution over all candidates; any other client is asked for the
+number as text (constrained choice). Either way every candidate is legal,
+so there is never a retry: an answer that names no candidate leaves the
+scanner's order in place.
+
+    python vishal_gomoku_rank.py --malformed-rate 0.1
+
+compares LLM calls, legal answers and latency per move between each
+agent's free-text prompt and rank mode against the stand-in LLM.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import math
+import os
+import re
+import time
+from typing import Any, Dict, List, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard
+from vishal_gomoku_prompt import candidates, cell_label, compact_board
+from vishal_gomoku_trace import NULL_TRACE
+
+# Rank tactical candidates in one LLM call (1) instead of asking for a free-text move (0).
+DEFAULT_LLM_RANK = os.environ.get("VISHAL_GOMOKU_LLM_RANK", "0") == "1"
+# Candidates offered to the model; at most 9 keeps every option a single digit token.
+DEFAULT_RANK_CANDIDATES = min(9, int(os.environ.get("VISHAL_GOMOKU_LLM_RANK_CANDIDATES", "6")))
+
+RANK_SYSTEM_PROMPT = """
+You play Gomoku on an 8x8 board. Five stones in a row (across, down or diagonal) wins.
+Columns are A-H left to right, rows 1-8 top to bottom; cells are named like D4.
+The board is given as 8 row strings: X and O are stones, '.' is empty.
+You get a numbered list of candidate moves. Answer with the number of the best one and nothing else.
+""".strip()
+
+# A bare candidate number at the start of a text answer.
+_NUMBER = re.compile(r"^\s*(\d+)\b")
+
+
+class Ranking(NamedTuple):
+    moves: List[Tuple[Tuple[int, int], float]]  # (move, probability), best first
+    source: str  # "logprobs", "choice", "prior" (the scanner's order) or "forced"
+
+    @property
+    def best(self) -> Tuple[int, int] | None:
+        return self.moves[0][0] if self.moves else None
+
+    def prior(self) -> Dict[Tuple[int, int], float]:
+        """Move -> probability, e.g. for ordering a search's root moves."""
+        return dict(self.moves)
+
+
+def rank_messages(board: BitBoard, player: str, options: List[Tuple[int, int]]) -> List[Dict[str, str]]:
+    listing = "\n".join(f"{i} {cell_label(r, c)}" for i, (r, c) in enumerate(options, 1))
+    return [
+        {"role": "system", "content": RANK_SYSTEM_PROMPT},
+        {"role": "user", "content": f"You: {player}\n{compact_board(board)}\nCandidates:\n{listing}"},
+    ]
+
+
+def _from_logprobs(options: List[Tuple[int, int]], top: List[Tuple[str, float]]) -> Dict[int, float]:
+    """Candidate index -> probability, renormalised over the candidates the model gave any mass."""
+    mass: Dict[int, float] = {}
+    for token, logprob in top:
+        token = token.strip()
+        if token.isdigit() and 1 <= int(token) <= len(options):
+            i = int(token) - 1
+            mass[i] = mass.get(i, 0.0) + math.exp(logprob)
+    total = sum(mass.values())
+    return {i: p / total for i, p in mass.items()} if total > 0 else {}
+
+
+async def rank_moves(llm: Any, board: BitBoard, player: str, legal_moves: List[Tuple[int, int]],
+                     trace: Any = NULL_TRACE, k: int = DEFAULT_RANK_CANDIDATES, **params: Any) -> Ranking:
+    """The tactical candidates ranked by one LLM call; candidates the model did not pick keep the scanner's order."""
+    options = candidates(board, player, legal_moves, k)
+    trace.lap("candidates")
+    if len(options) <= 1:
+        return Ranking([(m, 1.0) for m in options], "forced")
+    messages = rank_messages(board, player, options)
+    trace.note(llm_consulted=True)
+    top_logprobs = getattr(llm, "top_logprobs", None)
+    if top_logprobs is not None:
+        probs = _from_logprobs(options, await top_logprobs(messages=messages, n=len(options), **params))
+        source = "logprobs"
+    else:
+        answer = await llm.complete(messages=messages, max_tokens=2, **params)
+        m = _NUMBER.search(answer)
+        pick = int(m.group(1)) - 1 if m else -1
+        probs = {pick: 1.0} if 0 <= pick < len(options) else {}
+        source = "choice"
+    trace.lap("llm")
+    if not probs:
+        source = "prior"
+    order = sorted(range(len(options)), key=lambda i: (-probs.get(i, 0.0), i))
+    return Ranking([(options[i], probs.get(i, 0.0)) for i in order], source)
+
+
+async def _ask_all(agent: Any, boards: List[Tuple[BitBoard, str]]) -> Tuple[List[float], int]:
+    latencies, legal = [], 0
+    for board, player in boards:
+        opp = 'O' if player == 'X' else 'X'
+        start = time.perf_counter()
+        try:
+            move = await agent._ask_llm(board, board.to_standard(), player, opp, board.legal_moves())
+        except Exception:
+            move = None  # get_move would fall back
+        latencies.append(time.perf_counter() - start)
+        legal += move is not None
+    return sorted(latencies), legal
+
+
+class _TextOnly:
+    """A client without top_logprobs(), like the framework's."""
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        return await self.client.complete(messages=messages, **kwargs)
+
+
+def main() -> None:
+    from vishal_gomoku_bench import AGENTS, _make_agent, build_corpus
+    from vishal_gomoku_llm_server import StandInClient, StandInConfig
+
+    parser = argparse.ArgumentParser(description="LLM calls and latency per move: free-text prompts vs rank mode")
+    parser.add_argument("--agents", nargs="*", help=f"subset of {[a[0] for a in AGENTS]}")
+    parser.add_argument("--latency", type=float, default=0.3, help="stand-in latency per request, seconds")
+    parser.add_argument("--malformed-rate", type=float, default=0.1)
+    parser.add_argument("--logprobs", choices=["on", "off"], default="on",
+                        help="off ranks by constrained choice, as with a client without top_logprobs()")
+    args = parser.parse_args()
+
+    boards = [(board, player) for _, board, player in build_corpus() if board.empty_mask()]
+    print(f"{'agent':8} {'mode':6} {'calls/move':>10} {'legal':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, module, cls in AGENTS:
+        if args.agents and name not in args.agents:
+            continue
+        for rank in (False, True):
+            config = StandInConfig("engine", args.latency, malformed_rate=args.malformed_rate, seed=7)
+            client = StandInClient(config)
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = _make_agent(module, cls, 0.0)
+                agent.llm = client if args.logprobs == "on" else _TextOnly(client)
+                agent.llm_rank = rank
+                latencies, legal = asyncio.run(_ask_all(agent, boards))
+            p95 = latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)]
+            print(f"{name:8} {'rank' if rank else 'text':6} {config.stats['requests'] / len(boards):10.2f} "
+                  f"{legal / len(boards):6.0%} {latencies[len(latencies) // 2] * 1000:8.0f} {p95 * 1000:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard, bit_cells, shift
+from vishal_gomoku_threats import CELL_WINDOWS5, ThreatState
+from vishal_gomoku_tt import EXACT, LOWER, UPPER, TranspositionTable
+
+# Per-move wall-clock budget for the search, in seconds (0 disables it in the agents).
+DEFAULT_SEARCH_TIME = float(os.environ.get("VISHAL_GOMOKU_SEARCH_TIME", "0.5"))
+# Engine behind the agents' search step: "alphabeta" or "mcts".
+DEFAULT_ENGINE = os.environ.get("VISHAL_GOMOKU_ENGINE", "alphabeta")
+
+WIN = 1_000_000
+INF = 10 * WIN
+# Salt that keeps search entries apart from the agents' cached cascade moves.
+SEARCH_SALT = 0x5851F42D4C957F2D
+
+# Move-ordering value of a cell by how many stones one side has in a window
+# through it (the other side having none): playing there grows that window
+# for us, or spoils it for the opponent.
+ORDER_WEIGHTS = (1, 4, 32, 512, 16384, 16384)
+
+CENTER = (1 << 27) | (1 << 28) | (1 << 35) | (1 << 36)
+_NEIGHBOUR_STEPS = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+class SearchResult(NamedTuple):
+    move: Tuple[int, int] | None
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+    # Score of every root move searched at the last completed depth (side-to-move view).
+    root_scores: Dict[Tuple[int, int], int]
+
+
+class _Timeout(Exception):
+    pass
+
+
+def neighbourhood(occupied: int, radius: int = 2) -> int:
+    """Cells within `radius` king steps of a stone."""
+    near = occupied
+    for _ in range(radius):
+        grown = near
+        for dr, dc in _NEIGHBOUR_STEPS:
+            grown |= shift(near, dr, dc)
+        near = grown
+    return near
+
+
+class SearchEngine:
+    """Iterative-deepening negamax with alpha-beta pruning and a hard deadline.
+
+    Leaves are scored from ThreatState's incremental window patterns plus the
+    four/open-three rules the agents already use: a side to move with a four
+    wins, a side facing two separate winning cells loses. Interior nodes are
+    restricted to forced blocks whenever the opponent threatens five.
+    """
+
+    def __init__(self, tt: TranspositionTable | None = None, max_width: int = 12, check_every: int = 256):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.max_width = max_width
+        self.check_every = check_every
+        self.nodes = 0
+        # Set by stop() from another thread; cleared by resume() before the next search is handed over.
+        self.stopped = threading.Event()
+        self._deadline = 0.0
+        self._state: ThreatState | None = None
+
+    def search(self, board: BitBoard, player: str, time_budget: float = DEFAULT_SEARCH_TIME,
+               max_depth: int = 64, deadline: float | None = None) -> SearchResult:
+        """Best move for player on board, returning by `deadline` (perf_counter) or after time_budget."""
+        start = time.perf_counter()
+        self._deadline = deadline if deadline is not None else start + time_budget
+        self._state = ThreatState(board.copy())
+        self.nodes = 0
+        self.tt.new_search()
+        opp = 'O' if player == 'X' else 'X'
+
+        # The search runs on a private copy, so a timeout can unwind mid-line.
+        forced = 0 if self._state.fours[player] else self._state.winning_cells(opp)
+        root_moves = self._ordered_moves(player, opp, None, width=64, forced=forced)
+        if not root_moves:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start, {})
+        best_move, best_score, completed = root_moves[0], 0, 0
+        root_scores: Dict[Tuple[int, int], int] = {}
+
+        # A win on the board or a single forced block needs no search.
+        if self._state.fours[player] or len(root_moves) == 1:
+            score = WIN if self._state.fours[player] else 0
+            return SearchResult(best_move, score, 0, 0, time.perf_counter() - start, {best_move: score})
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move, scores = self._root(depth, player, opp, root_moves)
+            except _Timeout:
+                break
+            best_move, best_score, completed, root_scores = move, score, depth, scores
+            # Search the previous best first next time round.
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+            if abs(score) >= WIN - 64 or depth >= self._state.board.empty_mask().bit_count():
+                break
+        return SearchResult(best_move, best_score, completed, self.nodes, time.perf_counter() - start, root_scores)
+
+    def stop(self) -> None:
+        """Make a search running on another thread return its best-so-far move at the next deadline check.
+
+        The flag outlives the start of search(), so a stop issued before the
+        worker thread gets there still ends that search.
+        """
+        self.stopped.set()
+
+    def resume(self) -> None:
+        """Clear a stop(); call before submitting a search that stop() may end."""
+        self.stopped.clear()
+
+    def _root(self, depth: int, player: str, opp: str, moves: List[Tuple[int, int]]):
+        state = self._state
+        alpha, best_move = -INF, moves[0]
+        scores: Dict[Tuple[int, int], int] = {}
+        for r, c in moves:
+            state.place(r, c, player)
+            score = -self._negamax(depth - 1, -INF, -alpha, opp, player, 1)
+            state.undo()
+            scores[(r, c)] = score
+            if score > alpha:
+                alpha, best_move = score, (r, c)
+        return alpha, best_move, scores
+
+    def _negamax(self, depth: int, alpha: int, beta: int, player: str, opp: str, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes % self.check_every == 0 and (self.stopped.is_set() or time.perf_counter() > self._deadline):
+            raise _Timeout()
+        state = self._state
+        if state.fours[player]:
+            return WIN - ply
+        opp_wins = state.winning_cells(opp)
+        if opp_wins & (opp_wins - 1):
+            # Two separate winning cells: only one can be blocked.
+            return -(WIN - ply - 1)
+        if depth <= 0:
+            return self._evaluate(player)
+
+        key = state.board.side_key(player) ^ SEARCH_SALT
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            _, e_depth, _, flag, value, tt_move = entry
+            if e_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+        moves = self._ordered_moves(player, opp, tt_move, width=self.max_width, forced=opp_wins)
+        if not moves:
+            return 0
+        original_alpha = alpha
+        best, best_move = -INF, moves[0]
+        for r, c in moves:
+            state.place(r, c, player)
+            score = -self._negamax(depth - 1, -beta, -alpha, opp, player, ply + 1)
+            state.undo()
+            if score > best:
+                best, best_move = score, (r, c)
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, best, best_move, flag)
+        return best
+
+    def _evaluate(self, player: str) -> int:
+        state = self._state
+        score = state.score if player == 'X' else -state.score
+        # The side to move with an open three can make an open four first.
+        if state.three_cells(player, open_only=True):
+            score += 300
+        return score
+
+    def _ordered_moves(self, player: str, opp: str, tt_move: Tuple[int, int] | None,
+                       width: int, forced: int = 0) -> List[Tuple[int, int]]:
+        state = self._state
+        board = state.board
+        empty = board.empty_mask()
+        if state.fours[player]:
+            candidates = state.winning_cells(player)
+        elif forced:
+            candidates = forced
+        else:
+            occupied = board.occupied()
+            candidates = (neighbourhood(occupied) & empty) if occupied else CENTER & empty
+        mine, theirs = state.counts[player], state.counts[opp]
+        scored = []
+        for r, c in bit_cells(candidates):
+            value = 0
+            for w in CELL_WINDOWS5[r * 8 + c]:
+                a, b = mine[w], theirs[w]
+                if b == 0:
+                    value += ORDER_WEIGHTS[a]
+                if a == 0:
+                    value += ORDER_WEIGHTS[b]
+            scored.append((-value, abs(r - 3.5) + abs(c - 3.5), (r, c)))
+        scored.sort()
+        moves = [m for _, _, m in scored[:width]]
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        elif tt_move is not None and candidates & (1 << (tt_move[0] * 8 + tt_move[1])):
+            moves.insert(0, tt_move)
+        return moves
+
+
+def make_engine(tt: TranspositionTable | None = None, kind: str = DEFAULT_ENGINE):
+    """The agents' move-search engine; both kinds share search(board, player, time_budget)."""
+    if kind == "mcts":
+        from vishal_gomoku_mcts import MCTSEngine
+        return MCTSEngine()
+    return SearchEngine(tt=tt)
@@ -0,0 +1,272 @@
+from typing import List, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard, DIRECTIONS, FULL_MASK, bit_cells, shift, winning_mask
+
+
+def _build_windows(length: int) -> List[Tuple[int, ...]]:
+    """Every run of `length` consecutive cells along rows, columns and both diagonals."""
+    windows = []
+    for dr, dc in DIRECTIONS:
+        for r in range(8):
+            for c in range(8):
+                end_r, end_c = r + dr * (length - 1), c + dc * (length - 1)
+                if 0 <= end_r < 8 and 0 <= end_c < 8:
+                    windows.append(tuple((r + dr * k) * 8 + (c + dc * k) for k in range(length)))
+    return windows
+
+
+def _mask(cells) -> int:
+    m = 0
+    for i in cells:
+        m |= 1 << i
+    return m
+
+
+def _index_by_cell(windows: List[Tuple[int, ...]]) -> List[List[int]]:
+    index: List[List[int]] = [[] for _ in range(64)]
+    for w, cells in enumerate(windows):
+        for i in cells:
+            index[i].append(w)
+    return index
+
+
+# Built once at import: 96 five-windows and 130 four-windows on the 8x8 board.
+WINDOWS5 = _build_windows(5)
+WINDOW5_MASKS = [_mask(w) for w in WINDOWS5]
+WINDOW5_INNER = [_mask(w[1:4]) for w in WINDOWS5]  # .XXX. has exactly these three stones
+WINDOWS4 = _build_windows(4)
+WINDOW4_MASKS = [_mask(w) for w in WINDOWS4]
+WINDOW4_ENDS = [_mask((w[0], w[3])) for w in WINDOWS4]  # .XXX / XXX. leave an end empty
+
+# Pattern weight of a five-window by how many stones one side has in it
+# (the other side having none): lone stone, two, three, four, five.
+PATTERN_WEIGHTS = (0, 1, 10, 100, 1000, 100000)
+
+# CELL_WINDOWS5[cell] = ids of the (at most 20) five-windows through that cell
+CELL_WINDOWS5 = _index_by_cell(WINDOWS5)
+CELL_WINDOWS4 = _index_by_cell(WINDOWS4)
+
+# Manhattan distance of every cell to the centre of the board.
+CENTER_DIST = [abs(i // 8 - 3.5) + abs(i % 8 - 3.5) for i in range(64)]
+
+
+def find_threat_mask(board: BitBoard, player: str, target_count: int, broken_threes: bool = True) -> int:
+    """Mask of cells that complete (4) or extend (3) player's windows, visiting each window once.
+
+    Same patterns as the agents' line scan:
+    - 4: XXXX. / XX.XX ... in a five-window with no opponent stone -> the empty cell
+    - 3: .XXX. (and X.XX / XX.X when broken_threes) -> the empties; a closed
+      three (one opponent stone) -> its empty; .XXX / XXX. four-windows -> the open end
+    Other target counts match nothing.
+    """
+    mine = board.stones(player)
+    theirs = board.o if player == 'X' else board.x
+    empty = board.empty_mask()
+    out = 0
+    if target_count == 4:
+        for mask in WINDOW5_MASKS:
+            if (mine & mask).bit_count() == 4 and not theirs & mask:
+                out |= mask & empty
+    elif target_count == 3:
+        for w, mask in enumerate(WINDOW5_MASKS):
+            if (mine & mask).bit_count() != 3:
+                continue
+            opp_count = (theirs & mask).bit_count()
+            if opp_count == 0:
+                if broken_threes or mine & mask == WINDOW5_INNER[w]:
+                    out |= mask & empty
+            elif opp_count == 1:
+                out |= mask & empty
+        for w, mask in enumerate(WINDOW4_MASKS):
+            if (mine & mask).bit_count() == 3 and not theirs & mask:
+                out |= mask & empty & WINDOW4_ENDS[w]
+    return out
+
+
+def find_threats(board: BitBoard, player: str, target_count: int, broken_threes: bool = True) -> List[Tuple[int, int]]:
+    """List form of find_threat_mask, in row-major order."""
+    return bit_cells(find_threat_mask(board, player, target_count, broken_threes))
+
+
+class MoveScores(NamedTuple):
+    """Per-cell evaluation of every move for one side, indexed by r * 8 + c."""
+    line: List[int]      # longest contiguous run through the cell after playing it; -1 if occupied
+    forks: List[int]     # directions in which that run reaches three or more
+    center: List[float]  # CENTER_DIST
+    gives_five: int      # mask of cells after which the opponent can complete five (occupied cells included)
+
+    def value(self, r: int, c: int) -> int:
+        """The agents' move score: line length first, forks as a tie-break."""
+        i = r * 8 + c
+        return self.line[i] * 10 + self.forks[i]
+
+    def key(self, move: Tuple[int, int]) -> Tuple[int, float]:
+        """min() key: best value first, then closest to the centre."""
+        return (-self.value(*move), self.center[move[0] * 8 + move[1]])
+
+
+def score_moves(board: BitBoard, player: str) -> MoveScores:
+    """Evaluate all 64 cells at once instead of one run_lengths() walk per candidate.
+
+    For each direction, ahead[k] / behind[k] mark the cells whose k next /
+    previous cells hold player's stones, so a run of length L through an empty
+    cell is ahead[a] & behind[L - 1 - a] for some a. The blunder mask needs no
+    per-move probe: the opponent's winning cells only shrink by the cell we take.
+    """
+    own = board.stones(player)
+    empty = board.empty_mask()
+    line = [1 if empty >> i & 1 else -1 for i in range(64)]
+    forks = [0] * 64
+    for dr, dc in DIRECTIONS:
+        ahead, behind = [FULL_MASK], [FULL_MASK]
+        step_a, step_b = shift(own, -dr, -dc), shift(own, dr, dc)
+        for _ in range(7):
+            ahead.append(step_a & shift(ahead[-1], -dr, -dc))
+            behind.append(step_b & shift(behind[-1], dr, dc))
+        for length in range(2, 9):
+            runs = 0
+            for a in range(length):
+                runs |= ahead[a] & behind[length - 1 - a]
+            runs &= empty
+            if not runs:
+                break
+            for r, c in bit_cells(runs):
+                i = r * 8 + c
+                if length > line[i]:
+                    line[i] = length
+                if length == 3:
+                    forks[i] += 1
+    opp_stones = board.o if player == 'X' else board.x
+    opp_wins = winning_mask(opp_stones, empty)
+    if opp_wins & (opp_wins - 1):
+        gives_five = FULL_MASK
+    elif opp_wins:
+        gives_five = FULL_MASK & ~opp_wins
+    else:
+        gives_five = ~empty & FULL_MASK
+    return MoveScores(line, forks, CENTER_DIST, gives_five)
+
+
+class ThreatState:
+    """X and O stone counts for every five-window, kept in step with a BitBoard.
+
+    place()/undo() touch only the (at most 20) windows through the cell, and
+    the windows holding four or three stones of one side and none of the other
+    are tracked as sets, so "where can X complete five" or "where are O's
+    threes" are answered without rescanning the board.
+
+    `score` is the sum of PATTERN_WEIGHTS over windows owned by X minus those
+    owned by O, kept up to date the same way.
+    """
+
+    __slots__ = ("board", "counts", "fours", "threes", "score")
+
+    def __init__(self, board: BitBoard | None = None):
+        self.board = board if board is not None else BitBoard()
+        self.counts = {'X': [0] * len(WINDOWS5), 'O': [0] * len(WINDOWS5)}
+        self.fours = {'X': set(), 'O': set()}
+        self.threes = {'X': set(), 'O': set()}
+        self.score = 0
+        self._recount()
+
+    def _recount(self) -> None:
+        for player in ('X', 'O'):
+            stones = self.board.stones(player)
+            self.counts[player] = [(stones & mask).bit_count() for mask in WINDOW5_MASKS]
+            self.fours[player].clear()
+            self.threes[player].clear()
+        self.score = sum(self._refresh(w) for w in range(len(WINDOWS5)))
+
+    def _refresh(self, w: int) -> int:
+        """Update the four/three sets for window w and return its pattern score."""
+        x, o = self.counts['X'][w], self.counts['O'][w]
+        for player, own, other in (('X', x, o), ('O', o, x)):
+            if other == 0 and own == 4:
+                self.fours[player].add(w)
+            else:
+                self.fours[player].discard(w)
+            if other == 0 and own == 3:
+                self.threes[player].add(w)
+            else:
+                self.threes[player].discard(w)
+        if o == 0:
+            return PATTERN_WEIGHTS[x]
+        if x == 0:
+            return -PATTERN_WEIGHTS[o]
+        return 0
+
+    def window_score(self, w: int) -> int:
+        x, o = self.counts['X'][w], self.counts['O'][w]
+        if o == 0:
+            return PATTERN_WEIGHTS[x]
+        if x == 0:
+            return -PATTERN_WEIGHTS[o]
+        return 0
+
+    def place(self, r: int, c: int, player: str) -> None:
+        self.board.place(r, c, player)
+        own = self.counts[player]
+        for w in CELL_WINDOWS5[r * 8 + c]:
+            before = self.window_score(w)
+            own[w] += 1
+            self.score += self._refresh(w) - before
+
+    def undo(self) -> Tuple[int, int]:
+        last = self.board.last_move()
+        if last is None:
+            raise IndexError("undo from an empty history")
+        r, c, player = last
+        self.board.undo()
+        own = self.counts[player]
+        for w in CELL_WINDOWS5[r * 8 + c]:
+            before = self.window_score(w)
+            own[w] -= 1
+            self.score += self._refresh(w) - before
+        return r, c
+
+    def sync(self, board: BitBoard) -> "ThreatState":
+        """Catch up with a freshly parsed board.
+
+        When the new position only adds stones to the tracked one (the usual
+        case between two of our turns) just those stones are placed; anything
+        else (new game, takeback) triggers a full recount.
+        """
+        x, o = self.board.x, self.board.o
+        if board.x & x == x and board.o & o == o:
+            for r, c in bit_cells(board.x & ~x):
+                self.place(r, c, 'X')
+            for r, c in bit_cells(board.o & ~o):
+                self.place(r, c, 'O')
+        else:
+            self.board = board.copy()
+            self._recount()
+        return self
+
+    def winning_cells(self, player: str) -> int:
+        """Mask of cells where player completes five with one stone."""
+        m = 0
+        for w in self.fours[player]:
+            m |= WINDOW5_MASKS[w]
+        return m & self.board.empty_mask()
+
+    def three_cells(self, player: str, open_only: bool = False) -> int:
+        """Mask of empties in windows holding three of player's stones and none of the other side.
+
+        With open_only, only contiguous .XXX. windows count and their two ends are returned.
+        """
+        stones = self.board.stones(player)
+        m = 0
+        for w in self.threes[player]:
+            if open_only and stones & WINDOW5_MASKS[w] != WINDOW5_INNER[w]:
+                continue
+            m |= WINDOW5_MASKS[w]
+        return m & self.board.empty_mask()
+
+    def has_five(self, player: str) -> bool:
+        return 5 in self.counts[player]
+
+    def gives_immediate_win(self, r: int, c: int, player: str, opponent: str) -> bool:
+        """True if player's stone on (r, c) leaves opponent a five on the next move."""
+        self.place(r, c, player)
+        lost = bool(self.fours[opponent])
+        self.undo()
+        return lost
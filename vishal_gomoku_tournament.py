@@ -0,0 +1,316 @@
+"""Parallel self-play tournament between the agent variants and engine-only baselines.
+
+    python vishal_gomoku_tournament.py --games 20 --results tournament.jsonl
+    python vishal_gomoku_tournament.py --results tournament.jsonl --ratings-only
+
+Every pair plays --games games, alternating colours, each from a short
+seeded random opening. Games run on a process pool sized to the host. One
+JSON line per finished game is appended to --results, so an interrupted
+run picks up where it stopped. Bradley-Terry ratings on the Elo scale are
+reported with bootstrap 95% confidence intervals, next to CPU ms, LLM
+calls and LLM moves overruled by the veto per move. A "+gate" suffix (e.g. agent5+gate) plays that agent with
+the LLM gate on, so the gate's call rate and strength can be set against
+the ungated agent's:
+
+    python vishal_gomoku_tournament.py --players agent5 agent5+gate alphabeta --search-time 0 --llm standin
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Tuple
+from vishal_gomoku_bench import AGENTS, BenchState, StubLLM
+from vishal_gomoku_bitboard import BitBoard
+from vishal_gomoku_llm_server import StandInClient, StandInConfig
+from vishal_gomoku_search import SearchEngine
+
+BASELINES = ["alphabeta", "random"]
+PLAYERS = [name for name, _, _ in AGENTS] + BASELINES
+GATED = "+gate"
+
+
+class _EnginePlayer:
+    """Engine-only baseline with the agents' get_move interface."""
+
+    def __init__(self, kind: str, search_time: float, seed: int):
+        self.kind = kind
+        self.search_time = search_time
+        self.engine = SearchEngine()
+        self.rng = random.Random(seed)
+
+    async def get_move(self, state: BenchState) -> Tuple[int, int]:
+        if self.kind == "alphabeta":
+            move = self.engine.search(state.board, state.current_player.value, self.search_time).move
+            if move is not None:
+                return move
+        return self.rng.choice(state.get_legal_moves())
+
+
+class _CountingLLM:
+    """Counts complete() and top_logprobs() calls on the way to the agent's LLM client.
+
+    Every other attribute is the inner client's, so an agent sees the same
+    capabilities (top_logprobs() for rank mode, for one) as without the wrapper.
+    """
+
+    def __init__(self, inner: Any):
+        self.inner = inner
+        self.calls = 0
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        self.calls += 1
+        return await self.inner.complete(messages=messages, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.inner, name)
+        if name != "top_logprobs":
+            return attr
+
+        async def top_logprobs(messages: List[Dict[str, str]], n: int, **kwargs: Any) -> Any:
+            self.calls += 1
+            return await attr(messages=messages, n=n, **kwargs)
+        return top_logprobs
+
+
+# Worker-process state: one instance per player name, built on first use.
+_players: Dict[str, Any] = {}
+
+
+def _get_player(name: str, search_time: float, llm: str) -> Any:
+    if name not in _players:
+        if name in BASELINES:
+            _players[name] = _EnginePlayer(name, search_time, os.getpid())
+        else:
+            _, module, cls = next(a for a in AGENTS if a[0] == name.removesuffix(GATED))
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent = getattr(importlib.import_module(module), cls)(f"tournament-{name}")
+            if llm == "stub":
+                agent.llm = StubLLM()
+            elif llm == "standin":
+                agent.llm = StandInClient(StandInConfig("random"))
+            agent.llm = _CountingLLM(agent.llm)
+            agent.search_time = search_time
+            if hasattr(agent, "gate"):
+                agent.gate.enabled = name.endswith(GATED)
+            _players[name] = agent
+    return _players[name]
+
+
+def _overruled(agent: Any) -> int:
+    veto = getattr(agent, "veto", None)
+    return veto.counts["overruled"] if veto is not None else 0
+
+
+def _opening(seed: int, stones: int) -> BitBoard:
+    """A few seeded random stones in the central 4x4, so repeated pairings play different games."""
+    rng = random.Random(seed)
+    board = BitBoard()
+    for k, cell in enumerate(rng.sample([r * 8 + c for r in range(2, 6) for c in range(2, 6)], stones)):
+        board.place(cell // 8, cell % 8, 'XO'[k % 2])
+    return board
+
+
+def play_game(game: Dict[str, Any], search_time: float, llm: str) -> Dict[str, Any]:
+    """Play one game in this process and return its result record."""
+    x_name, o_name = game["x"], game["o"]
+    board = _opening(game["seed"], game["opening"])
+    names = {'X': x_name, 'O': o_name}
+    cpu = {'X': 0.0, 'O': 0.0}
+    moves = {'X': 0, 'O': 0}
+    llm_calls = {'X': 0, 'O': 0}
+    overruled = {'X': 0, 'O': 0}
+    player = 'X' if board.stone_count() % 2 == 0 else 'O'
+    winner, reason = None, "draw"
+    loop = asyncio.new_event_loop()
+    try:
+        while board.empty_mask():
+            agent = _get_player(names[player], search_time, llm)
+            start = time.process_time()
+            calls = getattr(getattr(agent, "llm", None), "calls", 0)
+            vetoed = _overruled(agent)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    move = loop.run_until_complete(agent.get_move(BenchState(board.copy(), player)))
+            except Exception as e:
+                move, reason = None, f"error: {type(e).__name__}"
+            cpu[player] += time.process_time() - start
+            llm_calls[player] += getattr(getattr(agent, "llm", None), "calls", 0) - calls
+            overruled[player] += _overruled(agent) - vetoed
+            moves[player] += 1
+            opp = 'O' if player == 'X' else 'X'
+            if move is None or not board.is_empty(*move):
+                winner, reason = opp, reason if move is None else f"illegal move {tuple(move)}"
+                break
+            board.place(move[0], move[1], player)
+            if board.has_five(player):
+                winner, reason = player, "five"
+                break
+            player = opp
+    finally:
+        # Stop both sides' pondering before the loop goes: the players are reused in later games.
+        for name in names.values():
+            agent = _players.get(name)
+            if hasattr(agent, "end_game"):
+                loop.run_until_complete(agent.end_game())
+        loop.close()
+    return {
+        "id": game["id"],
+        "x": x_name,
+        "o": o_name,
+        "winner": None if winner is None else names[winner],
+        "reason": reason,
+        "plies": board.stone_count(),
+        "cpu_ms": {x_name: cpu['X'] * 1000, o_name: cpu['O'] * 1000},
+        "moves": {x_name: moves['X'], o_name: moves['O']},
+        "llm_calls": {x_name: llm_calls['X'], o_name: llm_calls['O']},
+        "llm_overruled": {x_name: overruled['X'], o_name: overruled['O']},
+        "board": str(board),
+    }
+
+
+def schedule(players: List[str], games: int, opening: int, seed: int) -> List[Dict[str, Any]]:
+    """Every pair plays `games` games, alternating who moves first."""
+    plan = []
+    for i, a in enumerate(players):
+        for b in players[i + 1:]:
+            for g in range(games):
+                x, o = (a, b) if g % 2 == 0 else (b, a)
+                plan.append({"id": f"{a}|{b}|{g}", "x": x, "o": o, "seed": seed * 1_000_003 + len(plan),
+                             "opening": opening})
+    return plan
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    records = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        pass  # a line cut short by an interrupted run
+    return records
+
+
+def bradley_terry(records: Iterable[Dict[str, Any]], players: List[str], iterations: int = 200) -> Dict[str, float]:
+    """Bradley-Terry strengths by the MM algorithm, as Elo points with the mean at 0.
+
+    A draw counts half a win for each side; every player also gets one
+    virtual draw against the field so a perfect score stays finite.
+    """
+    index = {p: i for i, p in enumerate(players)}
+    n = len(players)
+    wins = [0.5] * n
+    pair_games: Dict[Tuple[int, int], float] = {}
+    for rec in records:
+        if rec["x"] not in index or rec["o"] not in index:
+            continue
+        a, b = index[rec["x"]], index[rec["o"]]
+        key = (min(a, b), max(a, b))
+        pair_games[key] = pair_games.get(key, 0.0) + 1
+        if rec["winner"] is None:
+            wins[a] += 0.5
+            wins[b] += 0.5
+        else:
+            wins[index[rec["winner"]]] += 1
+    strength = [1.0] * n
+    for _ in range(iterations):
+        new = []
+        for i in range(n):
+            denom = 1.0 / (strength[i] + 1.0)  # the virtual draw against a strength-1 field
+            for (a, b), count in pair_games.items():
+                if i == a or i == b:
+                    j = b if i == a else a
+                    denom += count / (strength[i] + strength[j])
+            new.append(wins[i] / denom)
+        scale = math.exp(sum(math.log(s) for s in new) / n)
+        strength = [s / scale for s in new]
+    return {p: 400 * math.log10(strength[index[p]]) for p in players}
+
+
+def ratings(records: List[Dict[str, Any]], players: List[str], bootstrap: int = 200, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """Elo-scale BT ratings with 95% bootstrap intervals, plus score, CPU ms, LLM calls and vetoes per move."""
+    point = bradley_terry(records, players)
+    rng = random.Random(seed)
+    samples: Dict[str, List[float]] = {p: [] for p in players}
+    for _ in range(bootstrap):
+        resample = [rng.choice(records) for _ in records]
+        for p, r in bradley_terry(resample, players, iterations=100).items():
+            samples[p].append(r)
+    table = {}
+    for p in players:
+        played = [r for r in records if p in (r["x"], r["o"])]
+        score = sum(1.0 if r["winner"] == p else 0.5 if r["winner"] is None else 0.0 for r in played)
+        cpu = sum(r.get("cpu_ms", {}).get(p, 0.0) for r in played)
+        moves = sum(r.get("moves", {}).get(p, 0) for r in played)
+        calls = sum(r.get("llm_calls", {}).get(p, 0) for r in played)
+        vetoes = sum(r.get("llm_overruled", {}).get(p, 0) for r in played)
+        ordered = sorted(samples[p])
+        table[p] = {
+            "elo": point[p],
+            "ci_low": ordered[int(0.025 * len(ordered))] if ordered else point[p],
+            "ci_high": ordered[min(len(ordered) - 1, int(0.975 * len(ordered)))] if ordered else point[p],
+            "games": len(played),
+            "score": score / len(played) if played else 0.0,
+            "cpu_ms_per_move": cpu / moves if moves else 0.0,
+            "llm_calls_per_move": calls / moves if moves else 0.0,
+            "llm_overruled_per_move": vetoes / moves if moves else 0.0,
+        }
+    return table
+
+
+def print_ratings(table: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'player':12} {'elo':>7} {'95% CI':>17} {'games':>6} {'score':>6} {'cpu ms/move':>12} {'llm/move':>9} "
+          f"{'veto/move':>10}")
+    for p, r in sorted(table.items(), key=lambda kv: -kv[1]["elo"]):
+        print(f"{p:12} {r['elo']:7.0f} [{r['ci_low']:6.0f}, {r['ci_high']:6.0f}] {r['games']:6d} "
+              f"{r['score']:6.3f} {r['cpu_ms_per_move']:12.1f} {r['llm_calls_per_move']:9.2f} "
+              f"{r['llm_overruled_per_move']:10.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Self-play tournament for the Gomoku agents")
+    parser.add_argument("--players", nargs="*", default=PLAYERS,
+                        help=f"subset of {PLAYERS}; append {GATED} to an agent for its gated variant")
+    parser.add_argument("--games", type=int, default=10, help="games per pair")
+    parser.add_argument("--opening", type=int, default=2, help="random stones placed before move one")
+    parser.add_argument("--search-time", type=float, default=0.1, help="per-move search budget for every player")
+    parser.add_argument("--llm", choices=["stub", "standin", "env"], default="stub",
+                        help="stub: instant fake LLM; standin: in-process stand-in LLM playing random legal moves; "
+                             "env: whatever VISHAL_GOMOKU_LLM_MODE builds (e.g. replay)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--results", default="tournament.jsonl", help="append-only results file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ratings-only", action="store_true", help="just rate the games already in --results")
+    args = parser.parse_args()
+
+    done = {r["id"] for r in load_results(args.results)}
+    plan = [g for g in schedule(args.players, args.games, args.opening, args.seed) if g["id"] not in done]
+    if not args.ratings_only and plan:
+        print(f"{len(plan)} games to play ({len(done)} already in {args.results}), {args.workers} workers")
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool, open(args.results, "a", encoding="utf-8") as out:
+            futures = [pool.submit(play_game, g, args.search_time, args.llm) for g in plan]
+            for n, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                out.write(json.dumps(record, separators=(",", ":")) + "\n")
+                out.flush()
+                if n % 10 == 0 or n == len(plan):
+                    rate = n / (time.perf_counter() - start) * 3600
+                    print(f"  {n}/{len(plan)} games ({rate:.0f}/hour)")
+    records = [r for r in load_results(args.results) if r["x"] in args.players and r["o"] in args.players]
+    if records:
+        print_ratings(ratings(records, args.players))
+
+
+if __name__ == "__main__":
+    main()
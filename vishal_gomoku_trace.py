@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+# JSON-lines file that receives one record per move; unset or empty disables tracing.
+TRACE_PATH = os.environ.get("VISHAL_GOMOKU_TRACE", "")
+
+_sink_lock = threading.Lock()
+_sink = None
+
+
+def _write(record: Dict[str, Any]) -> None:
+    global _sink
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with _sink_lock:
+        if _sink is None:
+            _sink = open(TRACE_PATH, "a", encoding="utf-8", buffering=1)
+        _sink.write(line)
+
+
+class MoveTrace:
+    """Per-phase wall and CPU time for one get_move() call, written as one JSON line.
+
+    lap(name) charges the time since the previous lap to `name`, which
+    suits get_move's straight-line steps; phase(name) is a context manager
+    for helpers nested inside them (each _find_all_threats call). Repeated
+    phases add up their times and call counts. note() attaches fields such
+    as the move source, the strategic tier that decided, whether the LLM
+    was consulted and the retry count.
+    """
+
+    enabled = True
+
+    def __init__(self, agent: str):
+        self.fields: Dict[str, Any] = {"agent": agent, "llm_consulted": False, "retries": 0}
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._wall = self._lap_wall = time.perf_counter()
+        self._cpu = self._lap_cpu = time.process_time()
+
+    def _add(self, name: str, wall: float, cpu: float) -> None:
+        stats = self.phases.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "calls": 0})
+        stats["wall_ms"] += wall * 1000
+        stats["cpu_ms"] += cpu * 1000
+        stats["calls"] += 1
+
+    def lap(self, name: str) -> None:
+        wall, cpu = time.perf_counter(), time.process_time()
+        self._add(name, wall - self._lap_wall, cpu - self._lap_cpu)
+        self._lap_wall, self._lap_cpu = wall, cpu
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def note(self, **fields: Any) -> None:
+        self.fields.update(fields)
+
+    def emit(self, move: Any = None) -> None:
+        record = dict(self.fields)
+        record["move"] = list(move) if move is not None else None
+        record["wall_ms"] = (time.perf_counter() - self._wall) * 1000
+        record["cpu_ms"] = (time.process_time() - self._cpu) * 1000
+        record["phases"] = self.phases
+        record["ts"] = time.time()
+        _write(record)
+
+
+class _NullContext:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+
+class _NullTrace:
+    """Stand-in when tracing is off: every call is a no-op on shared objects."""
+
+    enabled = False
+    _ctx = _NullContext()
+
+    def lap(self, name: str) -> None:
+        pass
+
+    def phase(self, name: str) -> _NullContext:
+        return self._ctx
+
+    def note(self, **fields: Any) -> None:
+        pass
+
+    def emit(self, move: Any = None) -> None:
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def start_trace(agent: str):
+    """A MoveTrace when VISHAL_GOMOKU_TRACE is set, else the shared no-op trace."""
+    return MoveTrace(agent) if TRACE_PATH else NULL_TRACE
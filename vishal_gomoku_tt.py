@@ -0,0 +1,85 @@
+import os
+from typing import Any, Dict, Tuple
+
+# Entry flags: EXACT for verdicts and exact search scores, LOWER/UPPER for
+# alpha-beta bounds.
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Rough resident size of one slot: the list reference plus the entry tuple
+# and its boxed key/value ints. Used only to turn a memory cap into a slot count.
+ENTRY_BYTES = 160
+
+DEFAULT_TT_BYTES = int(os.environ.get("VISHAL_GOMOKU_TT_MB", "16")) * 1024 * 1024
+
+# XOR salt on the agents' cached strategic moves, so they never answer a probe from the
+# engine search sharing the table (which salts its own keys with SEARCH_SALT).
+MOVE_SALT = 0x9E3779B97F4A7C15
+
+
+class TranspositionTable:
+    """Fixed-size, Zobrist-indexed table of tactical verdicts and best moves.
+
+    Each slot holds one (key, depth, age, flag, value, move) tuple. On a
+    collision the stored entry is replaced when the new one is at least as
+    deep or the stored one is from an older search (see new_search()).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_TT_BYTES):
+        slots = 1
+        while slots * 2 * ENTRY_BYTES <= max_bytes:
+            slots *= 2
+        self.max_bytes = max_bytes
+        self._mask = slots - 1
+        self._slots: list = [None] * slots
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.rejects = 0
+
+    def new_search(self) -> None:
+        """Start a new age; entries from earlier searches become replaceable."""
+        self.age = (self.age + 1) & 0xFFFF
+
+    def probe(self, key: int) -> Tuple[int, int, int, int, Any, Any] | None:
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, value: Any, move: Any = None, flag: int = EXACT) -> bool:
+        slot = key & self._mask
+        old = self._slots[slot]
+        if old is not None:
+            if old[2] == self.age and depth < old[1]:
+                self.rejects += 1
+                return False
+            if old[0] != key:
+                self.evictions += 1
+        self._slots[slot] = (key, depth, self.age, flag, value, move)
+        self.stores += 1
+        return True
+
+    def clear(self) -> None:
+        self._slots = [None] * len(self._slots)
+        self.hits = self.misses = self.stores = self.evictions = self.rejects = 0
+
+    def stats(self) -> Dict[str, Any]:
+        capacity = len(self._slots)
+        used = sum(1 for e in self._slots if e is not None)
+        lookups = self.hits + self.misses
+        return {
+            "capacity": capacity,
+            "used": used,
+            "fill": used / capacity,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "rejects": self.rejects,
+        }
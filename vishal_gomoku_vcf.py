@@ -0,0 +1,318 @@
+"""Threat-space solver for forced wins (VCF/VCT) and the key defense against them.
+
+    python vishal_gomoku_vcf.py --check
+
+re-runs the failure-memo check: a position whose VCT the old depth-blind
+memo missed (VCF depth 3, VCT depth 2), plus seeded random positions on
+which the memoised search must agree with one that never prunes.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard, bit_cells
+from vishal_gomoku_threats import CELL_WINDOWS5, WINDOW5_MASKS, ThreatState
+
+
+class ForcedMove(NamedTuple):
+    move: Tuple[int, int]
+    kind: str        # "vcf" / "vct" for our own win, "block-vcf" / "block-vct" for a defense
+    attacker: str    # side whose forced win was found
+    line: List[Tuple[int, int]]  # attacker and defender moves alternating, starting with the attacker
+    nodes: int
+
+
+class _Budget(Exception):
+    pass
+
+
+class ThreatSpaceSolver:
+    """Threat-space search for continuous-four (VCF) and continuous-three (VCT) wins.
+
+    VCF: every attacking move makes a four, so the defender's reply is the
+    single blocking cell. VCT also allows moves that create a threat to make an
+    open four next; the defender may then answer on any cell of the threatened
+    windows or with a four of their own, and the attack must succeed against
+    every such reply. Both searches stop at max_nodes or time_budget and then
+    report no win (setting `exhausted`), so a found line is always a real
+    forced win. forced_move() spends at most time_budget in total.
+    """
+
+    def __init__(self, max_nodes: int = 20000, time_budget: float = 0.15,
+                 vcf_depth: int = 12, vct_depth: int = 4):
+        self.max_nodes = max_nodes
+        self.time_budget = time_budget
+        self.vcf_depth = vcf_depth
+        self.vct_depth = vct_depth
+        self.nodes = 0
+        self.exhausted = False
+        # Set by stop() from another thread; cleared by resume() before the next call is handed over.
+        self.stopped = threading.Event()
+        self._deadline = 0.0
+        self._move_deadline: float | None = None
+        self._state: ThreatState | None = None
+        # Attacker-side key -> largest remaining VCF depth proven to fail from that position.
+        self._no_vcf: Dict[int, int] = {}
+
+    # ----- public API -----
+    def find_vcf(self, board: BitBoard, attacker: str) -> List[Tuple[int, int]] | None:
+        """Winning VCF line for attacker (attacker to move), or None."""
+        return self._run(board, attacker, vct=False)
+
+    def find_vct(self, board: BitBoard, attacker: str) -> List[Tuple[int, int]] | None:
+        """Winning VCT line for attacker (attacker to move), or None."""
+        return self._run(board, attacker, vct=True)
+
+    def forced_move(self, board: BitBoard, me: str) -> ForcedMove | None:
+        """Our forced win, else the key defense against the opponent's, else None.
+
+        Order: our VCF, their VCF, our VCT, their VCT - a four-based attack
+        outranks any three-based one.
+        """
+        opp = 'O' if me == 'X' else 'X'
+        total = 0
+        self._move_deadline = time.perf_counter() + self.time_budget
+        try:
+            for vct in (False, True):
+                line = self._run(board, me, vct)
+                total += self.nodes
+                if line:
+                    return ForcedMove(line[0], "vct" if vct else "vcf", me, line, total)
+                line = self._run(board, opp, vct)
+                total += self.nodes
+                if line:
+                    move = self._refutation(board, me, opp, line, vct)
+                    total += self.nodes
+                    return ForcedMove(move, "block-vct" if vct else "block-vcf", opp, line, total)
+            return None
+        finally:
+            self._move_deadline = None
+
+    def stop(self) -> None:
+        """Make a forced_move() running on another thread give up at its next deadline check.
+
+        The flag outlives the start of forced_move(), so a stop issued before
+        the worker thread gets there still ends that call.
+        """
+        self.stopped.set()
+
+    def resume(self) -> None:
+        """Clear a stop(); call before submitting work that stop() may end."""
+        self.stopped.clear()
+
+    # ----- internals -----
+    def _run(self, board: BitBoard, attacker: str, vct: bool) -> List[Tuple[int, int]] | None:
+        defender = 'O' if attacker == 'X' else 'X'
+        self._state = ThreatState(board.copy())
+        self._deadline = time.perf_counter() + self.time_budget
+        if self._move_deadline is not None:
+            self._deadline = min(self._deadline, self._move_deadline)
+        self._no_vcf = {}
+        self.nodes = 0
+        self.exhausted = False
+        try:
+            if vct:
+                return self._vct(attacker, defender, self.vct_depth)
+            return self._vcf(attacker, defender, self.vcf_depth)
+        except _Budget:
+            self.exhausted = True
+            return None
+
+    def _refutation(self, board: BitBoard, me: str, opp: str, line: List[Tuple[int, int]], vct: bool) -> Tuple[int, int]:
+        """First cell of the opponent's line that kills every forced win for them."""
+        nodes = 0
+        for r, c in dict.fromkeys(line):
+            if not board.is_empty(r, c):
+                continue
+            board.place(r, c, me)
+            refuted = not self._run(board, opp, False) and not self.exhausted
+            nodes += self.nodes
+            if refuted and vct:
+                refuted = not self._run(board, opp, True) and not self.exhausted
+                nodes += self.nodes
+            board.undo()
+            if refuted:
+                self.nodes = nodes
+                return (r, c)
+        self.nodes = nodes
+        return line[0]
+
+    def _tick(self) -> None:
+        self.nodes += 1
+        if self.nodes >= self.max_nodes:
+            raise _Budget()
+        if self.nodes & 63 == 0 and (self.stopped.is_set() or time.perf_counter() > self._deadline):
+            raise _Budget()
+
+    def _vcf(self, a: str, d: str, depth: int) -> List[Tuple[int, int]] | None:
+        self._tick()
+        st = self._state
+        wins = st.winning_cells(a)
+        if wins:
+            return [bit_cells(wins)[0]]
+        if depth == 0:
+            return None
+        key = st.board.side_key(a)
+        # A failure only carries over to searches no deeper than the one that proved it.
+        if self._no_vcf.get(key, -1) >= depth:
+            return None
+        d_wins = st.winning_cells(d)
+        if d_wins & (d_wins - 1):
+            # Two defender fives cannot both be blocked by a four: lost at any depth.
+            self._no_vcf[key] = self.vcf_depth
+            return None
+        candidates = st.three_cells(a)
+        if d_wins:
+            # Our four has to land on the defender's winning cell.
+            candidates &= d_wins
+        for r, c in bit_cells(candidates):
+            st.place(r, c, a)
+            wins = st.winning_cells(a)
+            if wins & (wins - 1):
+                st.undo()
+                first, second = bit_cells(wins)[:2]
+                return [(r, c), first, second]
+            br, bc = bit_cells(wins)[0]
+            st.place(br, bc, d)
+            sub = self._vcf(a, d, depth - 1)
+            st.undo()
+            st.undo()
+            if sub is not None:
+                return [(r, c), (br, bc)] + sub
+        self._no_vcf[key] = depth
+        return None
+
+    def _vct(self, a: str, d: str, depth: int) -> List[Tuple[int, int]] | None:
+        self._tick()
+        st = self._state
+        line = self._vcf(a, d, self.vcf_depth)
+        if line is not None:
+            return line
+        if depth == 0 or st.winning_cells(d):
+            # With a defender four on the board only fours can keep the initiative.
+            return None
+        for r, c in self._three_moves(a, d):
+            st.place(r, c, a)
+            points = self._open_four_points(a)
+            if not points:
+                st.undo()
+                continue
+            defenses = points | self._threat_cells(a, r, c) | st.three_cells(d)
+            principal = None
+            for br, bc in bit_cells(defenses):
+                st.place(br, bc, d)
+                sub = self._vct(a, d, depth - 1)
+                st.undo()
+                if sub is None:
+                    principal = None
+                    break
+                if principal is None:
+                    principal = [(r, c), (br, bc)] + sub
+            st.undo()
+            if principal is not None:
+                return principal
+        return None
+
+    def _three_moves(self, a: str, d: str) -> List[Tuple[int, int]]:
+        """Empty cells in windows holding two attacker stones and no defender stone."""
+        st = self._state
+        own, other = st.counts[a], st.counts[d]
+        cells = 0
+        for w, mask in enumerate(WINDOW5_MASKS):
+            if own[w] == 2 and other[w] == 0:
+                cells |= mask
+        cells &= st.board.empty_mask()
+        scored = []
+        for r, c in bit_cells(cells):
+            value = sum(1 for w in CELL_WINDOWS5[r * 8 + c] if own[w] == 2 and other[w] == 0)
+            scored.append((-value, abs(r - 3.5) + abs(c - 3.5), (r, c)))
+        scored.sort()
+        return [m for _, _, m in scored]
+
+    def _open_four_points(self, a: str) -> int:
+        """Cells where attacker's next stone would leave two or more winning cells."""
+        st = self._state
+        points = 0
+        for r, c in bit_cells(st.three_cells(a)):
+            st.place(r, c, a)
+            wins = st.winning_cells(a)
+            st.undo()
+            if wins & (wins - 1):
+                points |= 1 << (r * 8 + c)
+        return points
+
+    def _threat_cells(self, a: str, r: int, c: int) -> int:
+        """Empty cells of the attacker's three-windows through (r, c)."""
+        st = self._state
+        threes = st.threes[a]
+        cells = 0
+        for w in CELL_WINDOWS5[r * 8 + c]:
+            if w in threes:
+                cells |= WINDOW5_MASKS[w]
+        return cells & st.board.empty_mask()
+
+
+# X to move has a VCT at VCF depth 3, VCT depth 2 that the depth-blind memo missed: a failure
+# stored with little VCF depth left was read back as a failure at full depth.
+MEMO_REGRESSION = (BitBoard(0xe016021040010004, 0x2000080a082400), 'X', 3, 2)
+
+
+class _Forgetful(dict):
+    """A failure memo that never stores, for the unpruned reference search."""
+
+    def __setitem__(self, key: int, value: int) -> None:
+        pass
+
+
+def check_memo(positions: int, seed: int = 0) -> List[str]:
+    """Positions where the memoised solver and the unpruned one disagree, one line each."""
+    from vishal_gomoku_bench import _random_position
+
+    board, attacker, vcf_depth, vct_depth = MEMO_REGRESSION
+    cases = [(board, attacker, vcf_depth, vct_depth)]
+    rng = random.Random(seed)
+    for _ in range(positions):
+        cases.append((*_random_position(rng, rng.randrange(6, 30)), rng.randrange(2, 13), rng.randrange(1, 3)))
+    problems = []
+    for board, attacker, vcf_depth, vct_depth in cases:
+        found = []
+        for memo in (True, False):
+            solver = ThreatSpaceSolver(max_nodes=10 ** 6, time_budget=30.0, vcf_depth=vcf_depth, vct_depth=vct_depth)
+            defender = 'O' if attacker == 'X' else 'X'
+            solver._state = ThreatState(board.copy())
+            solver._deadline = time.perf_counter() + solver.time_budget
+            solver._no_vcf = {} if memo else _Forgetful()
+            try:
+                found.append(solver._vct(attacker, defender, vct_depth) is not None)
+            except _Budget:
+                found.append(None)
+        if None not in found and found[0] != found[1]:
+            problems.append(f"{attacker} x={board.x:#x} o={board.o:#x} vcf_depth={vcf_depth} vct_depth={vct_depth}: "
+                            f"memo {'finds' if found[0] else 'misses'} a VCT the unpruned search "
+                            f"{'does not' if found[0] else 'finds'}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Threat-space solver checks")
+    parser.add_argument("--check", action="store_true", help="run the failure-memo check and exit 1 on a mismatch")
+    parser.add_argument("--positions", type=int, default=2000, help="random positions besides the regression case")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    board, attacker, vcf_depth, vct_depth = MEMO_REGRESSION
+    solver = ThreatSpaceSolver(vcf_depth=vcf_depth, vct_depth=vct_depth)
+    print(f"{attacker} to move:\n{board}\nVCT: {solver.find_vct(board, attacker)} ({solver.nodes} nodes)")
+    if args.check:
+        problems = check_memo(args.positions, args.seed)
+        for line in problems[:20]:
+            print(line)
+        print(f"memo: {len(problems)} mismatches over {args.positions + 1} positions")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
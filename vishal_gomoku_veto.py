@@ -0,0 +1,105 @@
+"""Post-LLM blunder check shared by every agent.
+
+A legal LLM move can still throw the game: it may skip a win on the
+board, or leave the opponent a cell that completes five. The veto keeps a
+ThreatState in step with the game (only the stones added since the last
+check are placed), so both questions are a mask test against its tracked
+four-windows. A vetoed move is replaced by the winning cell, else by the
+block, which is what the engine plays in those positions. Counters record
+how often the LLM was overruled and why.
+
+    python vishal_gomoku_veto.py
+
+times the check over the bench corpus with random legal moves standing in
+for LLM answers.
+"""
+import argparse
+import os
+import random
+import time
+from typing import Any, Awaitable, Dict, NamedTuple, Tuple
+from vishal_gomoku_bitboard import BitBoard, bit_cells, cell_bit
+from vishal_gomoku_threats import ThreatState
+
+# Overrule LLM moves that miss a win or leave the opponent a five (1), or play them as-is (0).
+DEFAULT_LLM_VETO = os.environ.get("VISHAL_GOMOKU_LLM_VETO", "1") == "1"
+
+
+class VetoDecision(NamedTuple):
+    move: Tuple[int, int] | None  # the move to play: the LLM's, or its replacement
+    reason: str  # "ok", "misses-win" or "ignores-block"
+
+
+class LLMVeto:
+    """Rejects LLM moves that lose on the spot and substitutes the forced move."""
+
+    def __init__(self, enabled: bool = DEFAULT_LLM_VETO):
+        self.enabled = enabled
+        self.state = ThreatState()
+        self.counts: Dict[str, int] = {"checked": 0, "overruled": 0, "misses-win": 0, "ignores-block": 0}
+
+    def check(self, board: BitBoard, player: str, move: Tuple[int, int] | None) -> VetoDecision:
+        """The move to play instead of the LLM's move on board, with the reason for any change."""
+        if not self.enabled or move is None:
+            return VetoDecision(move, "ok")
+        state = self.state.sync(board)
+        opp = 'O' if player == 'X' else 'X'
+        bit = cell_bit(*move)
+        self.counts["checked"] += 1
+        wins, threats = state.winning_cells(player), state.winning_cells(opp)
+        if wins and not wins & bit:
+            reason, mask = "misses-win", wins
+        elif threats and not (threats | wins) & bit:
+            reason, mask = "ignores-block", threats
+        else:
+            return VetoDecision(move, "ok")
+        self.counts["overruled"] += 1
+        self.counts[reason] += 1
+        return VetoDecision(bit_cells(mask)[0], reason)
+
+    async def screen(self, ask: Awaitable[Tuple[int, int] | None], board: BitBoard, player: str,
+                     trace: Any = None) -> Tuple[int, int] | None:
+        """Await an LLM move and return it, or its replacement when the veto overrules it."""
+        decision = self.check(board, player, await ask)
+        if decision.reason != "ok":
+            print(f"VETO: LLM move overruled ({decision.reason}), playing {decision.move}")
+            if trace is not None:
+                trace.note(veto=decision.reason)
+        return decision.move
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus the share of checked LLM moves that were overruled."""
+        out: Dict[str, Any] = dict(self.counts)
+        out["overrule_rate"] = self.counts["overruled"] / self.counts["checked"] if self.counts["checked"] else 0.0
+        return out
+
+
+def main() -> None:
+    from vishal_gomoku_bench import build_corpus
+
+    parser = argparse.ArgumentParser(description="Time the LLM veto over the bench corpus")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    positions = [(board, player, rng.choice(board.legal_moves())) for _, board, player in build_corpus()
+                 if board.empty_mask()]
+    veto = LLMVeto(enabled=True)
+    for board, player, move in positions:
+        veto.check(board, player, move)
+    print(" ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in veto.stats().items()))
+    # Timed as in a game: each check syncs from the previous position's state, here one board at a time.
+    elapsed, checks = 0.0, 0
+    for board, player, move in positions:
+        veto.state = ThreatState(board.copy())
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            veto.check(board, player, move)
+        elapsed += time.perf_counter() - start
+        checks += args.repeat
+    print(f"{elapsed / checks * 1e6:.1f} us per check (state in step)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,48 @@
 import json
-import re
-import random
-from typing import Tuple
+from typing import Any, Dict, List, Tuple
 
 # The competition framework should provide these imports
 from gomoku import Agent, GameState
-from gomoku.llm import OpenAIGomokuClient
+from vishal_gomoku_bitboard import BitBoard, cell_bit
+from vishal_gomoku_pipeline import MovePipelineMixin
 
 
-class VishalGomokuLLMAgent(Agent):
+class VishalGomokuLLMAgent(MovePipelineMixin, Agent):
     """LLM-powered Gomoku agent for 8x8 five-in-a-row tournament."""
 
+    # Simplified but powerful user prompt
+    user_prompt_template = (
+        "=== GOMOKU BATTLE ===\n"
+        "You are: {me}\n"
+        "Opponent: {opp}\n"
+        "Move #{move}\n\n"
+
+        "BOARD:\n{board}\n\n"
+
+        "URGENT CHECKS (do these in order):\n"
+        "1. Can YOU win in 1 move? Check if placing {me} anywhere creates 5-in-a-row!\n"
+        "2. Can OPPONENT win in 1 move? Check if they have 4-in-a-row to block!\n"
+        "3. Does opponent have dangerous 3-in-a-row patterns? Block them!\n"
+        "4. Can you extend your longest sequence?\n\n"
+
+        "EXAMPLES FROM YOUR LOSING GAMES:\n"
+        "- SuperDuper won with (0,0)→(0,1)→(0,2)→(0,3)→(0,4) horizontally\n"
+        "- GomokuRobot won with (4,4)→(4,3)→(4,5)→(4,6)→(4,2) horizontally\n"
+        "- Don't let this happen again!\n\n"
+
+        "Legal moves: {legal_moves}\n\n"
+
+        "RESPOND WITH JSON:\n"
+        "- First check for wins and blocks\n"
+        "- Explain your reasoning clearly\n"
+        "- Choose coordinates from legal moves only\n"
+    )
+    llm_params = {
+        "max_tokens": 100,   # Shorter responses, more focused
+        "response_format": {"type": "json_object"},
+    }
+    llm_temperature = 0.0  # Most deterministic for tactical decisions
+
     def __init__(self, agent_id: str):
         super().__init__(agent_id)
         print(f"Created VishalGomokuLLMAgent: {agent_id}")
@@ -18,8 +50,7 @@ class VishalGomokuLLMAgent(Agent):
     def _setup(self):
         """Setup LLM client and system prompt."""
         self.system_prompt = self._create_system_prompt()
-
-        self.llm = OpenAIGomokuClient(model="google/gemma-2-9b-it")
+        self._setup_pipeline()
 
     def _create_system_prompt(self) -> str:
         """Enhanced strategic Gomoku system prompt."""
@@ -69,52 +100,23 @@ REMEMBER: Blocking opponent threats is MORE IMPORTANT than creating your own!
     def _check_immediate_win(self, game_state: GameState, player: str) -> Tuple[int, int] | None:
         """Check if there's an immediate winning move for the given player."""
         legal_moves = game_state.get_legal_moves()
-        board = [['.'] * 8 for _ in range(8)]
-        
+
         # Reconstruct board from game state
-        board_str = game_state.format_board(formatter="standard")
-        lines = board_str.strip().split('\n')
-        for i, line in enumerate(lines):
-            for j, cell in enumerate(line):
-                if cell in ['X', 'O']:
-                    board[i][j] = cell
-        
-        # Check each legal move
+        board = BitBoard.from_string(game_state.format_board(formatter="standard"))
+
+        # Every cell where one more stone completes 5-in-a-row (all directions, all gaps)
+        wins = board.winning_cells(player)
+        if not wins:
+            return None
+
+        # Return the first legal move that wins
         for row, col in legal_moves:
-            # Temporarily place the piece
-            board[row][col] = player
-            
-            # Check all 8 directions for 5-in-a-row
-            directions = [
-                (0, 1), (1, 0), (1, 1), (1, -1),  # horizontal, vertical, diagonals
-                (0, -1), (-1, 0), (-1, -1), (-1, 1)  # opposite directions
-            ]
-            
-            for dr, dc in [(0, 1), (1, 0), (1, 1), (1, -1)]:  # 4 main directions
-                count = 1  # count the placed piece
-                
-                # Count in positive direction
-                r, c = row + dr, col + dc
-                while 0 <= r < 8 and 0 <= c < 8 and board[r][c] == player:
-                    count += 1
-                    r, c = r + dr, c + dc
-                
-                # Count in negative direction  
-                r, c = row - dr, col - dc
-                while 0 <= r < 8 and 0 <= c < 8 and board[r][c] == player:
-                    count += 1
-                    r, c = r - dr, c - dc
-                
-                if count >= 5:
-                    board[row][col] = '.'  # restore board
-                    return (row, col)
-            
-            # Restore board
-            board[row][col] = '.'
-        
+            if wins & cell_bit(row, col):
+                return (row, col)
+
         return None
 
-    async def get_move(self, game_state: GameState) -> Tuple[int, int]:
+    async def _choose_move(self, game_state: GameState, deadline: float) -> Tuple[int, int]:
         """Return the next move coordinates as (row, col)."""
         try:
             me = game_state.current_player.value
@@ -122,102 +124,83 @@ REMEMBER: Blocking opponent threats is MORE IMPORTANT than creating your own!
             
             # SAFEGUARD: Check for immediate winning moves first
             winning_move = self._check_immediate_win(game_state, me)
+            self.trace.lap("safeguard")
             if winning_move:
                 print(f"SAFEGUARD: Immediate winning move found: {winning_move}")
+                self.trace.note(source="safeguard", tier="win")
                 return winning_move
             
             # SAFEGUARD: Check if we need to block opponent's winning move
             opponent_winning_move = self._check_immediate_win(game_state, opp)
+            self.trace.lap("safeguard")
             if opponent_winning_move:
                 print(f"SAFEGUARD: Blocking opponent's winning move: {opponent_winning_move}")
+                self.trace.note(source="safeguard", tier="block-four")
                 return opponent_winning_move
             
-            # Continue with LLM-based strategy
             board_str = game_state.format_board(formatter="standard")
+            self.trace.lap("format_board")
             legal_moves = game_state.get_legal_moves()
-            
-            # Count pieces for game phase analysis
-            board_lines = board_str.strip().split('\n')
-            move_count = sum(line.count('X') + line.count('O') for line in board_lines)
-            game_phase = "EARLY" if move_count <= 10 else "MID" if move_count <= 30 else "LATE"
-
-            # Simplified but powerful user prompt
-            user_prompt = (
-                f"=== GOMOKU BATTLE ===\n"
-                f"You are: {me}\n"
-                f"Opponent: {opp}\n"
-                f"Move #{move_count + 1}\n\n"
-                
-                f"BOARD:\n{board_str}\n\n"
-                
-                f"URGENT CHECKS (do these in order):\n"
-                f"1. Can YOU win in 1 move? Check if placing {me} anywhere creates 5-in-a-row!\n"
-                f"2. Can OPPONENT win in 1 move? Check if they have 4-in-a-row to block!\n"
-                f"3. Does opponent have dangerous 3-in-a-row patterns? Block them!\n"
-                f"4. Can you extend your longest sequence?\n\n"
-                
-                f"EXAMPLES FROM YOUR LOSING GAMES:\n"
-                f"- SuperDuper won with (0,0)→(0,1)→(0,2)→(0,3)→(0,4) horizontally\n"
-                f"- GomokuRobot won with (4,4)→(4,3)→(4,5)→(4,6)→(4,2) horizontally\n"
-                f"- Don't let this happen again!\n\n"
-                
-                f"Legal moves: {legal_moves}\n\n"
-                
-                f"RESPOND WITH JSON:\n"
-                f"- First check for wins and blocks\n"
-                f"- Explain your reasoning clearly\n"
-                f"- Choose coordinates from legal moves only\n"
-            )
-
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
-
-            kwargs = dict(
-                messages=messages,
-                temperature=0.0,  # Most deterministic for tactical decisions
-                max_tokens=100,   # Shorter responses, more focused
-                response_format={"type": "json_object"},
-            )
-
-            # Enhanced retry loop with better error handling
-            for attempt in range(3):  # More attempts for better reliability
-                try:
-                    response = await self.llm.complete(**kwargs)
-                    data = json.loads(response)
-                    
-                    # Validate required keys
-                    if "row" not in data or "col" not in data:
-                        raise ValueError("Missing row or col in response")
-                    
-                    r, c = int(data["row"]), int(data["col"])
-
-                    if (r, c) in legal_moves:
-                        # Log the reasoning for debugging
-                        reasoning = data.get("reasoning", "No reasoning provided")
-                        print(f"Agent move: ({r},{c}) - {reasoning}")
-                        return r, c
-
-                    # If illegal move, provide specific feedback
-                    messages.append({
-                        "role": "user",
-                        "content": (f"ILLEGAL MOVE: ({r},{c}) is not in legal moves.\n"
-                                  f"You MUST choose from: {legal_moves}\n"
-                                  f"Analyze the board again and pick a legal position.")
-                    })
-
-                except (json.JSONDecodeError, KeyError, ValueError) as parse_err:
-                    error_msg = (f"ERROR in attempt {attempt + 1}: {str(parse_err)}\n"
-                               f"You must respond with valid JSON containing 'row' and 'col' integers.\n"
-                               f"Legal moves: {legal_moves}")
-                    messages.append({"role": "user", "content": error_msg})
+            self.trace.lap("get_legal_moves")
+
+            board = BitBoard.from_string(board_str)
+            self.trace.lap("parse_board")
+
+            # Ponder, forced, race, gate, search, then the LLM with retries
+            move = await self._pipeline_move(board, board_str, me, opp, legal_moves, deadline)
+            if move is not None:
+                return move
 
         except Exception as e:
             print(f"Agent error: {e}")
+            self.trace.note(error=type(e).__name__)
 
         # Enhanced fallback: prefer center moves over random
-        return self._get_fallback_move(game_state)
+        self.trace.note(source="fallback")
+        move = self._get_fallback_move(game_state)
+        self.trace.lap("fallback")
+        return move
+
+    async def _complete_llm(self, messages: List[Dict[str, str]], params: Dict[str, Any],
+                            legal_moves: List[Tuple[int, int]]) -> Tuple[int, int] | None:
+        """The move from up to three requests, each retry told what was wrong with the last answer."""
+        # Enhanced retry loop with better error handling
+        for attempt in range(3):  # More attempts for better reliability
+            self.trace.note(retries=attempt)
+            try:
+                response = await self.llm.complete(messages=messages, **params)
+                self.trace.lap("llm")
+                data = json.loads(response)
+                
+                # Validate required keys
+                if "row" not in data or "col" not in data:
+                    raise ValueError("Missing row or col in response")
+                
+                r, c = int(data["row"]), int(data["col"])
+                self.trace.lap("json_parse")
+
+                if (r, c) in legal_moves:
+                    # Log the reasoning for debugging
+                    reasoning = data.get("reasoning", "No reasoning provided")
+                    print(f"Agent move: ({r},{c}) - {reasoning}")
+                    return r, c
+
+                # If illegal move, provide specific feedback
+                messages.append({
+                    "role": "user",
+                    "content": (f"ILLEGAL MOVE: ({r},{c}) is not in legal moves.\n"
+                              f"You MUST choose from: {legal_moves}\n"
+                              f"Analyze the board again and pick a legal position.")
+                })
+
+            except (json.JSONDecodeError, KeyError, ValueError) as parse_err:
+                self.trace.lap("json_parse")
+                error_msg = (f"ERROR in attempt {attempt + 1}: {str(parse_err)}\n"
+                           f"You must respond with valid JSON containing 'row' and 'col' integers.\n"
+                           f"Legal moves: {legal_moves}")
+                messages.append({"role": "user", "content": error_msg})
+
+        return None
 
     def _get_fallback_move(self, game_state: GameState) -> Tuple[int, int]:
         """Enhanced fallback: prefer center positions over random."""